@@ -37,6 +37,8 @@ def main():
     window = MainWindow()
     window.show()
 
+    dictionaries_storage.load()
+
     exit_status = app.exec()
 
     app.setStyleSheet('')
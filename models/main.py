@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 
 import operator
-from PySide6.QtCore import Qt, QSortFilterProxyModel
+from array import array
+from threading import Lock
+from concurrent.futures import Future, wait
+from PySide6.QtCore import Qt, QObject, QModelIndex, QSortFilterProxyModel, QThreadPool, QRunnable, Signal
 from typing import Union, List
 
 from .abstact import AbstractTableModel
@@ -15,9 +18,23 @@ from utils.constants import *
 
 class Model(AbstractTableModel):
 
+    CACHE_SIZE = 16384
+    CHUNK = 4096
+
     def __init__(self, parent=None):
         super().__init__(parent)
 
+        self.__cache = {}
+
+        # column -> (token, future of the ordering), built once and shared by the filter workers
+        self.__orders = {}
+        self.__orders_lock = Lock()
+
+        self.__numeration = None
+        self.__package = None
+        self.__instance = 0
+        self.__font = None
+
         self.addition_sort = RECORD_MAIN_INDEX
 
         self.index_mapping = {
@@ -33,6 +50,65 @@ class Model(AbstractTableModel):
     def columnCount(self, parent=None):
         return 9
 
+    def append(self, rows):
+        self.beginResetModel()
+        self.items.extend(rows)
+        self.endResetModel()
+
+    def replace(self, rows):
+        self.__cache.clear()
+        with self.__orders_lock:
+            self.__orders.clear()
+        super().replace(rows)
+
+    def clear(self):
+        self.__cache.clear()
+        with self.__orders_lock:
+            self.__orders.clear()
+        super().clear()
+
+    def filter(self, rows):
+        self.layoutAboutToBeChanged.emit()
+
+        indexes = self.persistentIndexList()
+        if indexes:
+            positions = {item: i for i, item in enumerate(rows)}
+            changed = []
+            for index in indexes:
+                row = index.row()
+                row = positions.get(self.filtered[row]) if 0 <= row < len(self.filtered) else None
+                changed.append(self.index(row, index.column()) if row is not None else QModelIndex())
+            self.filtered = rows
+            self.changePersistentIndexList(indexes, changed)
+        else:
+            self.filtered = rows
+
+        self.layoutChanged.emit()
+
+    def prepare(self):
+        self.__numeration = config.value('view', 'numeration')
+        self.__package = app_state.current_package
+        self.__instance = app_state.current_instance
+        self.__font = app_state.monospace.font() if app_state.monospace is not None else None
+
+    def display(self, item, column):
+        if column == COLUMN_MAIN_ID:
+            return item.id_hex
+
+        elif column == COLUMN_MAIN_INSTANCE:
+            return item.instance_hex
+
+        elif column == COLUMN_MAIN_GROUP:
+            return item.group_hex
+
+        txt = item.source if column == COLUMN_MAIN_SOURCE else item.translate
+        if txt:
+            if not str(txt).strip(' '):
+                return '[SPACEBAR]' * (len(txt.split(' ')) - 1)
+            else:
+                return text_to_table(txt)
+        return '[NULL]'
+
     def data(self, index, role=Qt.ItemDataRole.DisplayRole):
         if not index.isValid():
             return None
@@ -45,9 +121,12 @@ class Model(AbstractTableModel):
 
         item = self.filtered[row]
 
+        if self.__numeration is None:
+            self.prepare()
+
         if role == Qt.ItemDataRole.FontRole:
             if column in (COLUMN_MAIN_INDEX, COLUMN_MAIN_ID, COLUMN_MAIN_GROUP, COLUMN_MAIN_INSTANCE):
-                return app_state.monospace.font()
+                return self.__font
 
         elif role == Qt.ItemDataRole.ForegroundRole:
             if column in (COLUMN_MAIN_SOURCE, COLUMN_MAIN_TRANSLATE):
@@ -60,49 +139,184 @@ class Model(AbstractTableModel):
                 return None
 
             if column == COLUMN_MAIN_INDEX:
-                numeration = config.value('view', 'numeration')
+                numeration = self.__numeration
                 if numeration == NUMERATION_SOURCE:
                     return item.idx_source
                 elif numeration == NUMERATION_XML_DP:
-                    instance = app_state.current_instance
-                    return item[RECORD_MAIN_INDEX_ALT][3] if instance > 0 else item[RECORD_MAIN_INDEX_ALT][2]
+                    return item[RECORD_MAIN_INDEX_ALT][3] if self.__instance > 0 else item[RECORD_MAIN_INDEX_ALT][2]
                 else:
-                    if app_state.current_package:
+                    if self.__package:
                         return item[RECORD_MAIN_INDEX_ALT][0]
                     else:
                         return item.idx
 
-            elif column == COLUMN_MAIN_ID:
-                return item.id_hex
-
-            elif column == COLUMN_MAIN_INSTANCE:
-                return item.instance_hex
-
-            elif column == COLUMN_MAIN_GROUP:
-                return item.group_hex
-
-            elif column in (COLUMN_MAIN_SOURCE, COLUMN_MAIN_TRANSLATE):
-                txt = item.source if column == COLUMN_MAIN_SOURCE else item.translate
-                if txt:
-                    if not str(txt).strip(' '):
-                        return '[SPACEBAR]' * (len(txt.split(' ')) - 1)
-                    else:
-                        return text_to_table(txt)
-                return '[NULL]'
+            elif column in (COLUMN_MAIN_ID, COLUMN_MAIN_INSTANCE, COLUMN_MAIN_GROUP,
+                            COLUMN_MAIN_SOURCE, COLUMN_MAIN_TRANSLATE):
+                cache = self.__cache
+                key = (item, column)
+                revision = item.revision
+                cached = cache.get(key)
+                if cached is not None and cached[0] == revision:
+                    return cached[1]
+
+                value = self.display(item, column)
+                if len(cache) >= self.CACHE_SIZE:
+                    del cache[next(iter(cache))]
+                cache[key] = (revision, value)
+                return value
 
             elif column == COLUMN_MAIN_COMMENT:
                 return item.comment
 
         return None
 
-    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
-        self.beginResetModel()
-        reverse = order == Qt.SortOrder.DescendingOrder
+    def sort_key(self, column):
         idx = self.index_mapping.get(column, RECORD_MAIN_INDEX)
-        key = operator.itemgetter(idx,
-                                  self.addition_sort) if 0 <= self.addition_sort != idx else operator.itemgetter(idx)
-        self.filtered.sort(key=key, reverse=reverse)
-        self.endResetModel()
+        addition = self.addition_sort if 0 <= self.addition_sort != idx else None
+
+        if idx in (RECORD_MAIN_SOURCE, RECORD_MAIN_TRANSLATE, RECORD_MAIN_COMMENT):
+            if addition is not None:
+                return lambda item: ((item[idx] or '').casefold(), item[addition])
+            return lambda item: (item[idx] or '').casefold()
+
+        if addition is not None:
+            return operator.itemgetter(idx, addition)
+        return operator.itemgetter(idx)
+
+    def ordering(self, column, items: list, records, revision: int, cancelled=None) -> Union[tuple, None]:
+        # ascending order of all items by column, and the position of every store row in it,
+        # None when cancelled before it was built
+        idx = self.index_mapping.get(column, RECORD_MAIN_INDEX)
+        if idx not in (RECORD_MAIN_GROUP, RECORD_MAIN_TRANSLATE, RECORD_MAIN_FLAG, RECORD_MAIN_COMMENT):
+            revision = None
+        token = (records, len(items), revision, self.addition_sort)
+
+        while True:
+            with self.__orders_lock:
+                cached = self.__orders.get(column)
+                if cached is None or cached[0] != token or cached[1].cancelled():
+                    future = Future()
+                    self.__orders[column] = (token, future)
+                    break
+                future = cached[1]
+
+            # another worker builds it, it is built here only if that one is cancelled
+            while not future.done():
+                if cancelled is not None and cancelled():
+                    return None
+                wait((future,), timeout=0.05)
+
+            if not future.cancelled():
+                return future.result()
+
+        # waiters are woken with the error and the entry is dropped, so the next call builds it again
+        try:
+            key = self.sort_key(column)
+
+            keys = []
+            for i in range(0, len(items), self.CHUNK):
+                if cancelled is not None and cancelled():
+                    future.cancel()
+                    return None
+                keys.extend([key(item) for item in items[i:i + self.CHUNK]])
+
+            order = [items[i] for i in sorted(range(len(items)), key=keys.__getitem__)]
+
+            rank = array('I', bytes(4 * len(items)))
+            for position, item in enumerate(order):
+                rank[item.row] = position
+        except BaseException as e:
+            with self.__orders_lock:
+                if self.__orders.get(column, (None, None))[1] is future:
+                    del self.__orders[column]
+            future.set_exception(e)
+            raise
+
+        future.set_result((order, rank))
+        return order, rank
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        records = app_state.packages_storage.records
+        rank = self.ordering(column, self.items, records, records.revision)[1]
+        rows = sorted(self.filtered, key=lambda item: rank[item.row], reverse=order == Qt.SortOrder.DescendingOrder)
+        self.filter(rows)
+
+
+class FilterSignals(QObject):
+    finished = Signal(int, object)
+
+
+class FilterWorker(QRunnable):
+
+    CHUNK = 4096
+
+    def __init__(self, generation: int, model: Model, items: list, candidates: Union[list, None], check, state: tuple,
+                 column: int, reverse: bool):
+        super().__init__()
+
+        self.generation = generation
+        self.model = model
+        self.items = items
+        self.candidates = candidates
+        self.check = check
+        self.records, self.revision = state
+        self.column = column
+        self.reverse = reverse
+
+        self.cancelled = False
+
+        self.signals = FilterSignals()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        filtered = self.__run()
+
+        if filtered is not None and not self.cancelled:
+            self.signals.finished.emit(self.generation, filtered)
+
+    def __run(self) -> Union[list, None]:
+        ordering = self.model.ordering(self.column, self.items, self.records, self.revision, lambda: self.cancelled)
+
+        if ordering is None or self.cancelled:
+            return None
+
+        order, rank = ordering
+
+        check = self.check
+        candidates = self.candidates
+
+        if candidates is not None and len(candidates) * 8 < len(order):
+            # few candidates, sorting them by rank is cheaper than walking the whole order
+            filtered = self.__filter(candidates, check)
+            if filtered is None:
+                return None
+            filtered.sort(key=lambda item: rank[item.row])
+
+        else:
+            if candidates is not None:
+                selected = bytearray(len(rank))
+                for item in candidates:
+                    selected[item.row] = 1
+                filtered = self.__filter(order, lambda item: selected[item.row] and check(item))
+            else:
+                filtered = self.__filter(order, check)
+            if filtered is None:
+                return None
+
+        if self.reverse:
+            filtered.reverse()
+
+        return filtered
+
+    def __filter(self, items: list, check) -> Union[list, None]:
+        filtered = []
+        for i in range(0, len(items), self.CHUNK):
+            if self.cancelled:
+                return None
+            filtered.extend([item for item in items[i:i + self.CHUNK] if check(item)])
+        return filtered
 
 
 class ProxyModel(QSortFilterProxyModel):
@@ -120,6 +334,16 @@ class ProxyModel(QSortFilterProxyModel):
         self.__column = COLUMN_MAIN_INDEX
         self.__order = Qt.SortOrder.AscendingOrder
 
+        self.__query = None
+        self.__state = None
+        self.__results = []
+
+        self.__pending = None
+        self.__generation = 0
+        self.__worker = None
+
+        self.__pool = QThreadPool()
+
     def filter(self, package: str, instance: Union[str, int], text: str, mode: int, flags: List[int], different: bool):
         self.__package = package
         self.__mode = mode
@@ -149,33 +373,115 @@ class ProxyModel(QSortFilterProxyModel):
 
     def process_filter(self):
         model = self.sourceModel()
-        filtered_data = [i for i in model.items if self.check_filter(i)]
-        model.filter(filtered_data)
-        model.sort(self.__column, self.__order)
-
-    def check_filter(self, item):
-        if (self.__package and item[RECORD_MAIN_PACKAGE] != self.__package) \
-                or (self.__instance and item[RECORD_MAIN_INSTANCE] != self.__instance) \
-                or (self.__flags and item[RECORD_MAIN_FLAG] in self.__flags):
+
+        records = app_state.packages_storage.records
+        query = (self.__package, self.__instance, self.__text, self.__mode, set(self.__flags), self.__different)
+        state = (records, records.revision)
+
+        candidates = None
+        if self.__state == state and self.refines(self.__query, query):
+            candidates = self.__results
+        elif self.__text and self.__mode != SEARCH_IN_ID:
+            search_index = app_state.packages_storage.search_index
+            rows = search_index.search(self.__text, self.__mode) if search_index is not None else None
+            if rows is not None:
+                # store rows follow the order of model.items
+                candidates = [model.items[row] for row in rows]
+
+        self.__start(query, state, candidates, self.matcher(query))
+
+    def __start(self, query: tuple, state: tuple, candidates: Union[list, None], check) -> None:
+        if self.__worker is not None:
+            self.__worker.cancel()
+
+        self.__generation += 1
+        self.__pending = (query, state)
+
+        model = self.sourceModel()
+        worker = FilterWorker(self.__generation, model, list(model.items),
+                              list(candidates) if candidates is not None else None, check, state, self.__column,
+                              self.__order == Qt.SortOrder.DescendingOrder)
+        worker.signals.finished.connect(self.__finished)
+        worker.setAutoDelete(True)
+
+        self.__worker = worker
+        self.__pool.start(worker)
+
+    def stop(self) -> None:
+        # waits for the running workers before the records they read are closed
+        if self.__worker is not None:
+            self.__worker.cancel()
+            self.__worker = None
+
+        self.__generation += 1
+        self.__pool.waitForDone()
+
+    def __finished(self, generation: int, filtered: list) -> None:
+        if generation != self.__generation:
+            return
+
+        self.__worker = None
+
+        query, state = self.__pending
+        if state[0] is not app_state.packages_storage.records:
+            return
+
+        self.__query = query
+        self.__state = state
+        self.__results = filtered
+
+        self.sourceModel().filter(filtered)
+
+    @staticmethod
+    def refines(previous: Union[tuple, None], current: tuple) -> bool:
+        if previous is None:
             return False
 
-        if self.__different:
-            record_main_translate_old = item[RECORD_MAIN_TRANSLATE_OLD]
-            record_main_source_old = item[RECORD_MAIN_SOURCE_OLD]
-            if not record_main_translate_old and not record_main_source_old:
-                return False
+        package, instance, text, mode, flags, different = previous
 
-        if self.__text:
-            if self.__mode == SEARCH_IN_ID:
-                return self.__text == item[RECORD_MAIN_ID]
-            elif self.__mode == SEARCH_IN_SOURCE:
-                return self.__text in item[RECORD_MAIN_SOURCE].lower()
-            elif self.__mode == SEARCH_IN_DESTINATION:
-                return self.__text in item[RECORD_MAIN_TRANSLATE].lower()
-            else:
+        if (package and package != current[0]) \
+                or (instance and instance != current[1]) \
+                or (different and not current[5]) \
+                or not flags <= current[4]:
+            return False
+
+        if text is None:
+            return True
+
+        if mode != current[3] or current[2] is None:
+            return False
+
+        return text == current[2] if mode == SEARCH_IN_ID else text in current[2]
+
+    @staticmethod
+    def matcher(query: tuple):
+        package, instance, text, mode, flags, different = query
+
+        def check_filter(item):
+            if (package and item[RECORD_MAIN_PACKAGE] != package) \
+                    or (instance and item[RECORD_MAIN_INSTANCE] != instance) \
+                    or (flags and item[RECORD_MAIN_FLAG] in flags):
                 return False
 
-        return True
+            if different:
+                record_main_translate_old = item[RECORD_MAIN_TRANSLATE_OLD]
+                record_main_source_old = item[RECORD_MAIN_SOURCE_OLD]
+                if not record_main_translate_old and not record_main_source_old:
+                    return False
+
+            if text:
+                if mode == SEARCH_IN_ID:
+                    return text == item[RECORD_MAIN_ID]
+                elif mode == SEARCH_IN_SOURCE:
+                    return text in item.source_lower
+                elif mode == SEARCH_IN_DESTINATION:
+                    return text in item.translate_lower
+                else:
+                    return False
+
+            return True
+
+        return check_filter
 
     def headerData(self, section, orientation, role=None):
         if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
@@ -194,4 +500,11 @@ class ProxyModel(QSortFilterProxyModel):
     def sort(self, column, order=Qt.SortOrder.AscendingOrder):
         self.__column = column
         self.__order = order
-        self.sourceModel().sort(column, order)
+
+        if self.__query is None:
+            self.sourceModel().sort(column, order)
+        elif self.__worker is None:
+            # only the order changes, the current rows are already filtered
+            self.__start(self.__query, self.__state, self.sourceModel().filtered, lambda item: True)
+        else:
+            self.process_filter()
@@ -1,9 +1,16 @@
 # -*- coding: utf-8 -*-
 
 import io
+import os
+import sys
+import mmap
 import zlib
+import struct
+import operator
 import contextlib
-from collections import namedtuple
+from array import array
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor
 
 from packer.resource import Resource, ResourceID
 from packer import Packer
@@ -11,6 +18,15 @@ from packer import Packer
 
 _Header = namedtuple('_Header', 'file_version user_version ctime mtime index_count index_pos index_size')
 
+_CONST_TYPE = 1
+_CONST_GROUP = 2
+_CONST_INSTANCE_EX = 4
+
+COMPRESSION_NONE = 0x0000
+COMPRESSION_REFPACK = 0xFFFF
+COMPRESSION_REFPACK_STREAM = 0xFFFE
+COMPRESSION_ZLIB = 0x5A42
+
 
 class DbpfLocator(namedtuple('DbpfLocator', 'offset length compression')):
 
@@ -21,10 +37,29 @@ class DbpfLocator(namedtuple('DbpfLocator', 'offset length compression')):
 
 class _DbpfReader:
 
-    def __init__(self, fstream):
+    def __init__(self, fstream, memory_map=False):
+        self.stream = None
+        self.view = None
+
+        if memory_map:
+            try:
+                mapped = mmap.mmap(fstream.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError, io.UnsupportedOperation):
+                mapped = None
+            if mapped is not None:
+                self.stream = fstream
+                self.view = memoryview(mapped)
+                fstream = mapped
+
         self.f = Packer(fstream, mode='r')
         self.header = None
 
+    def get_raw(self, offset, length):
+        if self.view is not None:
+            return self.view[offset:offset + length]
+        with self.f.at(offset):
+            return self.f.get_raw_bytes(length)
+
     def get_header(self):
         if self.header is not None:
             return self.header
@@ -64,11 +99,18 @@ class _DbpfReader:
 
             return self.header
 
-    def get_index(self, package=None):
-        _CONST_TYPE = 1
-        _CONST_GROUP = 2
-        _CONST_INSTANCE_EX = 4
+    def fingerprint(self):
+        header = self.get_header()
+
+        if not header:
+            return 0
 
+        value = zlib.crc32(self.get_raw(0, 96))
+        if header.index_pos:
+            value = zlib.crc32(self.get_raw(header.index_pos, header.index_size), value)
+        return value
+
+    def get_index(self, package=None):
         header = self.get_header()
 
         if not header:
@@ -80,6 +122,65 @@ class _DbpfReader:
                 pass
             return []
 
+        index = self.decode_index(package)
+        if index is None:
+            return self.iter_index(package)
+        return index
+
+    def decode_index(self, package=None):
+        header = self.get_header()
+
+        constants = (_CONST_TYPE, _CONST_GROUP, _CONST_INSTANCE_EX)
+
+        with self.f.at(header.index_pos):
+            flags = self.f.get_uint32()
+            consts = tuple(self.f.get_uint32() if flags & flag else 0 for flag in constants)
+
+        fields = [i for i, flag in enumerate(constants) if not flags & flag]
+        offset = 4 + 4 * (len(constants) - len(fields))
+
+        # every entry is expected to carry the extended compression fields,
+        # otherwise the entries differ in size and the sequential reader is used
+        entry = struct.Struct('<' + 'I' * len(fields) + 'IIIIHH')
+        length = offset + header.index_count * entry.size
+
+        block = self.get_raw(header.index_pos, length)
+        if len(block) < length:
+            return None
+
+        # consts are prepended to each row, the getter reorders them into
+        # (type, group, instance_ex, instance, position, size, size_decompressed, compression...)
+        positions = [0, 1, 2]
+        for i, field in enumerate(fields):
+            positions[field] = 3 + i
+        getter = operator.itemgetter(*positions, *range(3 + len(fields), 3 + len(fields) + 6))
+
+        index = []
+        append = index.append
+        new = tuple.__new__
+
+        for row in entry.iter_unpack(memoryview(block)[offset:length]):
+            entry_type, entry_group, entry_inst_ex, entry_inst, entry_pos, entry_size, entry_size_decompressed, \
+                compression_type, compression_flags = getter(consts + row)
+
+            if not entry_size & 0x80000000:
+                return None
+
+            # namedtuples are built directly, their keyword constructors are the slowest part of the loop
+            append(new(Resource, (new(ResourceID, (entry_group, entry_inst_ex << 32 | entry_inst, entry_type)),
+                                  new(DbpfLocator, (entry_pos, entry_size & 0x7FFFFFFF,
+                                                    (compression_type, compression_flags))),
+                                  entry_size_decompressed,
+                                  package)))
+
+        return index
+
+    def iter_index(self, package=None):
+        header = self.get_header()
+
+        if not header or header.index_pos == 0:
+            return
+
         with self.f.at(header.index_pos):
             flags = self.f.get_uint32()
 
@@ -115,53 +216,121 @@ class _DbpfReader:
                                    size=entry_size_decompressed,
                                    package=package)
 
-    def write_index(self, idx):
+    def write_index(self):
         pass
 
-    def put_rsrc(self, content):
+    def put_rsrc(self, rid, content, compression=COMPRESSION_ZLIB):
         pass
 
+    def close(self):
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+
+        # raw payloads are views into the map, they must not be kept after closing,
+        # a map that is still exported would keep the file locked
+        try:
+            self.f.close()
+        finally:
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+
+
+class _DbpfIndex:
+
+    # one row of little-endian uint32 per entry, laid out exactly as the entry is stored:
+    # type, group, instance high, instance low, offset, length, size, compression
+    ROW = 8
+
+    def __init__(self):
+        self.rows = array('I')
+        self.positions = {}
+
+    def put(self, rid, offset, length, size, compression):
+        row = (rid.type, rid.group, rid.instance >> 32, rid.instance & 0xFFFFFFFF,
+               offset, length | 0x80000000, size, compression[0] | compression[1] << 16)
+
+        position = self.positions.get(rid)
+        if position is None:
+            self.positions[rid] = len(self.rows)
+            self.rows.extend(row)
+        else:
+            self.rows[position:position + self.ROW] = array('I', row)
+
+    def tobytes(self):
+        if sys.byteorder == 'little':
+            return self.rows.tobytes()
+        rows = array('I', self.rows)
+        rows.byteswap()
+        return rows.tobytes()
+
+    def __len__(self):
+        return len(self.positions)
+
 
 class _DbpfWriter:
 
-    def __init__(self, fstream):
+    def __init__(self, fstream, workers=None):
         self.stream = fstream
         self.f = Packer(fstream, mode='w')
         self.f.seek = 96
 
-    def put_rsrc(self, content):
-        seek = self.f.seek
-        zcontent = zlib.compress(content)
-        self.f.put_raw_bytes(zcontent)
-        locator = DbpfLocator(seek, len(zcontent), (0x5A42, 1))
-        return locator
+        self.index = _DbpfIndex()
 
-    def write_index(self, idx):
-        with self.f.at(None):
-            idx_start = self.f.seek
-            idx_count = 0
+        # payloads are built and compressed on the pool and written in submission order,
+        # at most max_pending of them are kept in memory at once
+        self.pool = ThreadPoolExecutor(max_workers=workers) if workers != 0 else None
+        self.pending = deque()
+        self.max_pending = (workers or os.cpu_count() or 1) * 4
 
-            self.f.put_uint32(0)
+    def put_rsrc(self, rid, content, compression=COMPRESSION_ZLIB):
+        if self.pool is None:
+            self.put_raw(rid, *_build(content, compression))
+        else:
+            self.pending.append((rid, self.pool.submit(_build, content, compression)))
+            self.flush(self.max_pending)
+
+    def put_raw(self, rid, raw, compression, size):
+        self.flush()
+        self._write(rid, raw, compression, size)
+
+    def flush(self, limit=0):
+        while len(self.pending) > limit:
+            rid, future = self.pending.popleft()
+            self._write(rid, *future.result())
+
+    def _write(self, rid, raw, compression, size):
+        offset = self.f.seek
+        if offset > 0xFFFFFFFF:
+            raise Exception('File must be smaller than 4GB')
+        if len(raw) & 0x80000000 != 0:
+            raise Exception('Resource must be smaller than 2GB')
+
+        self.f.put_raw_bytes(raw)
+        self.index.put(rid, offset, len(raw), size, compression)
 
-            for rsrc in idx.values():
-                if rsrc.locator.length & 0x80000000 != 0:
-                    raise Exception('File must be smaller than 2GB')
+    def close(self):
+        if self.pool is not None:
+            for _, future in self.pending:
+                future.cancel()
+            self.pool.shutdown()
+        self.f.close()
+
+    def write_index(self):
+        self.flush()
 
-                idx_count += 1
+        with self.f.at(None):
+            idx_start = self.f.seek
+            if idx_start > 0xFFFFFFFF:
+                raise Exception('File must be smaller than 4GB')
 
-                self.f.put_uint32(rsrc.id.type)
-                self.f.put_uint32(rsrc.id.group)
-                self.f.put_uint32(rsrc.id.instance >> 32)
-                self.f.put_uint32(rsrc.id.instance & 0xFFFFFFFF)
-                self.f.put_uint32(rsrc.locator.offset)
-                self.f.put_uint32(rsrc.locator.length | 0x80000000)
-                self.f.put_uint32(rsrc.size)
-                self.f.put_uint16(rsrc.locator.compression[0])
-                self.f.put_uint16(rsrc.locator.compression[1])
+            self.f.put_uint32(0)
+            self.f.put_raw_bytes(self.index.tobytes())
 
             idx_end = self.f.seek
 
-        header = _Header((2, 1), (0, 0), 0, 0, idx_count, idx_start, idx_end - idx_start)
+        header = _Header((2, 1), (0, 0), 0, 0, len(self.index), idx_start, idx_end - idx_start)
         self.put_header(header)
 
     def put_header(self, header):
@@ -189,19 +358,20 @@ class _DbpfWriter:
 
 class DbpfPackage:
 
-    def __init__(self, name, mode='r'):
+    def __init__(self, name, mode='r', memory_map=False, workers=None):
         super().__init__()
 
+        self._index_cache = None
+
         if isinstance(name, io.RawIOBase):
-            self.package = _DbpfReader(name)
+            self.package = _DbpfReader(name, memory_map=memory_map)
+            self.writable = False
         else:
             if mode == 'w':
-                self.package = _DbpfWriter(open(name, 'w+b'))
-                self._index_cache = {}
+                self.package = _DbpfWriter(open(name, 'w+b'), workers=workers)
                 self.writable = True
             else:
-                self.package = _DbpfReader(open(name, 'rb'))
-                self._index_cache = None
+                self.package = _DbpfReader(open(name, 'rb'), memory_map=memory_map)
                 self.writable = False
 
     def __getitem__(self, rid):
@@ -212,6 +382,10 @@ class DbpfPackage:
         return None
 
     def search(self, code=None):
+        # the index of a package being written only exists once it is committed
+        if self.writable:
+            raise Exception('Package is opened for writing: resources can not be read')
+
         if self._index_cache is None:
             self._index_cache = {}
             for entry in self.package.get_index(self):
@@ -223,50 +397,65 @@ class DbpfPackage:
     def search_stbl(self):
         return self.search(0x220557DA)
 
-    def content(self, resource):
+    def fingerprint(self):
+        return self.package.fingerprint()
+
+    def raw(self, resource):
         assert isinstance(resource, Resource)
         assert resource.package is self
 
-        with self.package.f.at(resource.locator.offset):
-            ibuf = self.package.f.get_raw_bytes(resource.locator.length)
+        return self.package.get_raw(resource.locator.offset, resource.locator.length)
+
+    def content(self, resource):
+        ibuf = self.raw(resource)
 
-        if resource.locator.compression[0] == 0:
-            return ibuf
-        elif resource.locator.compression[0] == 0xFFFE:
+        if resource.locator.compression[0] == COMPRESSION_NONE:
+            return bytes(ibuf)
+        elif resource.locator.compression[0] == COMPRESSION_REFPACK_STREAM:
             return decode_ref_pack(ibuf)
-        elif resource.locator.compression[0] == 0xFFFF:
+        elif resource.locator.compression[0] == COMPRESSION_REFPACK:
             return decode_ref_pack(ibuf)
-        elif resource.locator.compression[0] == 0x5A42:
+        elif resource.locator.compression[0] == COMPRESSION_ZLIB:
             return zlib.decompress(ibuf, 15, resource.size)
 
     def commit(self):
         if self.writable:
-            self.package.write_index(self._index_cache)
-            self.close()
+            try:
+                self.package.write_index()
+            finally:
+                self.close()
 
-    def put(self, rid, content):
+    def put(self, rid, content, compression=COMPRESSION_ZLIB):
         if self.writable:
-            self._index_cache[rid] = Resource(id=rid,
-                                              locator=self.package.put_rsrc(content),
-                                              size=len(content),
-                                              package=self)
+            self.package.put_rsrc(rid, content, compression)
+
+    def copy(self, resource):
+        if self.writable:
+            self.package.put_raw(resource.id, resource.package.raw(resource), resource.locator.compression,
+                                 resource.size)
 
     def close(self):
-        self.package.f.close()
+        self.package.close()
 
     @staticmethod
     @contextlib.contextmanager
-    def read(name):
-        dbfile = DbpfPackage(name, mode='r')
+    def read(name, memory_map=False):
+        dbfile = DbpfPackage(name, mode='r', memory_map=memory_map)
         try:
             yield dbfile
-        finally:
-            dbfile.close()
+        except BaseException:
+            # the traceback may still hold views into the map, the error that is raising is kept
+            try:
+                dbfile.close()
+            except BufferError:
+                pass
+            raise
+        dbfile.close()
 
     @staticmethod
     @contextlib.contextmanager
-    def write(name):
-        dbfile = DbpfPackage(name, mode='w')
+    def write(name, workers=None):
+        dbfile = DbpfPackage(name, mode='w', workers=workers)
         try:
             yield dbfile
         finally:
@@ -277,62 +466,179 @@ def decode_ref_pack(ibuf):
     if ibuf[1] != 0xFB:
         raise Exception('Invalid compressed data')
 
-    iptr = 2
-    optr = 0
     flags = ibuf[0]
-    osize = 0
+    iptr = 6 if flags & 0x80 else 5
 
-    for _ in range(4 if flags & 0x80 else 3):
-        osize = (osize << 8) | ibuf[iptr]
-        iptr += 1
+    osize = int.from_bytes(ibuf[2:iptr], 'big')
+    isize = len(ibuf)
 
     obuf = bytearray(osize)
-    while iptr < len(ibuf):
-        copy_offset = 0
+    optr = 0
+
+    while iptr < isize:
         cc0 = ibuf[iptr]
-        iptr += 1
         if cc0 <= 0x7F:
-            cc1 = ibuf[iptr]
-            iptr += 1
-            _cc = (cc0, cc1)
+            cc1 = ibuf[iptr + 1]
+            iptr += 2
             num_plaintext = cc0 & 0x03
             num_to_copy = ((cc0 & 0x1C) >> 2) + 3
             copy_offset = ((cc0 & 0x60) << 3) + cc1
         elif cc0 <= 0xBF:
-            cc1 = ibuf[iptr]
-            iptr += 1
-            cc2 = ibuf[iptr]
-            iptr += 1
-            _cc = (cc0, cc1, cc2)
+            cc1 = ibuf[iptr + 1]
+            cc2 = ibuf[iptr + 2]
+            iptr += 3
             num_plaintext = (cc1 & 0xC0) >> 6
             num_to_copy = (cc0 & 0x3F) + 4
             copy_offset = ((cc1 & 0x3F) << 8) + cc2
         elif cc0 <= 0xDF:
-            cc1 = ibuf[iptr]
-            iptr += 1
-            cc2 = ibuf[iptr]
-            iptr += 1
-            cc3 = ibuf[iptr]
-            iptr += 1
-            _cc = (cc0, cc1, cc2, cc3)
+            cc1 = ibuf[iptr + 1]
+            cc2 = ibuf[iptr + 2]
+            cc3 = ibuf[iptr + 3]
+            iptr += 4
             num_plaintext = cc0 & 0x03
             num_to_copy = ((cc0 & 0x0C) << 6) + cc3 + 5
             copy_offset = ((cc0 & 0x10) << 12) + (cc1 << 8) + cc2
         elif cc0 <= 0xFB:
-            _cc = (cc0,)
+            iptr += 1
             num_plaintext = ((cc0 & 0x1F) << 2) + 4
             num_to_copy = 0
         else:
-            _cc = (cc0,)
+            iptr += 1
             num_plaintext = cc0 & 3
             num_to_copy = 0
 
-        obuf[optr:optr + num_plaintext] = ibuf[iptr:iptr + num_plaintext]
-        iptr += num_plaintext
-        optr += num_plaintext
+        if num_plaintext:
+            obuf[optr:optr + num_plaintext] = ibuf[iptr:iptr + num_plaintext]
+            iptr += num_plaintext
+            optr += num_plaintext
+
+        if num_to_copy:
+            src = optr - 1 - copy_offset
+            end = optr + num_to_copy
+            if num_to_copy <= copy_offset + 1:
+                obuf[optr:end] = obuf[src:src + num_to_copy]
+                optr = end
+            else:
+                # the source overlaps the output, so the copied run is periodic;
+                # every pass doubles the span that is already available for copying
+                while optr < end:
+                    count = min(optr - src, end - optr)
+                    obuf[optr:optr + count] = obuf[src:src + count]
+                    optr += count
+
+    return bytes(obuf)
 
-        for _ in range(num_to_copy):
-            obuf[optr] = obuf[optr - 1 - copy_offset]
-            optr += 1
+
+def _match_length(ibuf, src, pos, limit):
+    length = 0
+    while length < limit:
+        step = min(16, limit - length)
+        if ibuf[src + length:src + length + step] != ibuf[pos + length:pos + length + step]:
+            while ibuf[src + length] == ibuf[pos + length]:
+                length += 1
+            return length
+        length += step
+    return length
+
+
+def encode_ref_pack(ibuf, max_chain=32):
+    ibuf = bytes(ibuf)
+    isize = len(ibuf)
+
+    if isize > 0xFFFFFF:
+        obuf = bytearray((0x90, 0xFB)) + isize.to_bytes(4, 'big')
+    else:
+        obuf = bytearray((0x10, 0xFB)) + isize.to_bytes(3, 'big')
+
+    def put_plaintext(start, end):
+        while end - start >= 4:
+            count = min(112, (end - start) & ~3)
+            obuf.append(0xE0 | ((count - 4) >> 2))
+            obuf.extend(ibuf[start:start + count])
+            start += count
+        return start
+
+    # hash chains over 3-byte prefixes, prev links every position to the
+    # previous one with the same prefix
+    head = {}
+    prev = [-1] * isize
+
+    iptr = 0
+    literal = 0
+
+    while iptr + 2 < isize:
+        key = ibuf[iptr:iptr + 3]
+        candidate = head.get(key, -1)
+        prev[iptr] = candidate
+        head[key] = iptr
+
+        best_length = 0
+        best_offset = 0
+        limit = min(1028, isize - iptr)
+        chain = max_chain
+
+        while candidate >= 0 and chain:
+            offset = iptr - candidate - 1
+            if offset >= 0x20000:
+                break
+            if ibuf[candidate + best_length] == ibuf[iptr + best_length]:
+                length = _match_length(ibuf, candidate, iptr, limit)
+                if length > best_length and (length >= 5 or
+                                             length == 4 and offset < 0x4000 or
+                                             length == 3 and offset < 0x400):
+                    best_length = length
+                    best_offset = offset
+                    if length == limit:
+                        break
+            candidate = prev[candidate]
+            chain -= 1
+
+        if not best_length:
+            iptr += 1
+            continue
+
+        literal = put_plaintext(literal, iptr)
+        num_plaintext = iptr - literal
+
+        if best_length <= 10 and best_offset < 0x400:
+            obuf.append(((best_offset >> 3) & 0x60) | ((best_length - 3) << 2) | num_plaintext)
+            obuf.append(best_offset & 0xFF)
+        elif best_length <= 67 and best_offset < 0x4000:
+            obuf.append(0x80 | (best_length - 4))
+            obuf.append((num_plaintext << 6) | (best_offset >> 8))
+            obuf.append(best_offset & 0xFF)
+        else:
+            obuf.append(0xC0 | ((best_offset >> 12) & 0x10) | (((best_length - 5) >> 8) << 2) | num_plaintext)
+            obuf.append((best_offset >> 8) & 0xFF)
+            obuf.append(best_offset & 0xFF)
+            obuf.append((best_length - 5) & 0xFF)
+
+        obuf.extend(ibuf[literal:iptr])
+
+        for i in range(iptr + 1, min(iptr + best_length, isize - 2)):
+            key = ibuf[i:i + 3]
+            prev[i] = head.get(key, -1)
+            head[key] = i
+
+        iptr += best_length
+        literal = iptr
+
+    literal = put_plaintext(literal, isize)
+    obuf.append(0xFC | (isize - literal))
+    obuf.extend(ibuf[literal:isize])
 
     return bytes(obuf)
+
+
+def compress(content, compression=COMPRESSION_ZLIB):
+    if compression == COMPRESSION_NONE:
+        return bytes(content), (COMPRESSION_NONE, 1)
+    elif compression in (COMPRESSION_REFPACK, COMPRESSION_REFPACK_STREAM):
+        return encode_ref_pack(content), (COMPRESSION_REFPACK, 1)
+    return zlib.compress(content), (COMPRESSION_ZLIB, 1)
+
+
+def _build(content, compression):
+    if callable(content):
+        content = content()
+    return (*compress(content, compression), len(content))
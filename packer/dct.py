@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+
+import io
+import sys
+import mmap
+import zlib
+import json
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+
+from packer import Packer
+
+
+MAGIC = b'DCT'
+VERSION = 5
+
+# magic, version, records count, hashed records count, heap size
+_HEADER = struct.Struct('<3sB3I')
+
+# (offset, length) of source, translate and comment in the string heap
+_RECORD = struct.Struct('<6I')
+_SOURCE = struct.Struct('<2I')
+
+# layout after the header, every column is little-endian uint32:
+#   sids[count]            ascending
+#   records[count]         _RECORD
+#   hashes[hashed]         crc32 of the utf-8 source, ascending
+#   hash_rows[hashed]      record row of every hash
+#   heap                   utf-8 strings
+
+
+def source_hash(value: bytes) -> int:
+    return zlib.crc32(value)
+
+
+def upgrade(version: int, items: list) -> list:
+    # older versions to [sid, source, translate, comment]
+    for item in items:
+        if version == 1:
+            item[0] = int(item[0], 16)
+            item.append(0)
+
+        if version < 3:
+            item.append('')
+
+        if version < 4:
+            item.pop(3)
+
+    return items
+
+
+def read_items(path: str) -> list:
+    with open(path, 'rb') as fp:
+        content = fp.read()
+
+    if content[:4] == MAGIC + bytes([VERSION]):
+        with Dct.read(path) as dictionary:
+            return [list(record) for record in dictionary]
+
+    packer = Packer(content, mode='r')
+
+    if packer.get_raw_bytes(3) == MAGIC:
+        version = packer.get_byte()
+        items = packer.get_json()
+    else:
+        version = 1
+        items = json.loads(zlib.decompress(packer.get_content()).decode('utf-8'))
+
+    return upgrade(version, items)
+
+
+def _column(buffer, offset: int, count: int):
+    if sys.byteorder == 'little':
+        return memoryview(buffer)[offset:offset + count * 4].cast('I')
+    column = array('I', bytes(buffer[offset:offset + count * 4]))
+    column.byteswap()
+    return column
+
+
+def _pack_column(values: array) -> bytes:
+    if sys.byteorder != 'little':
+        values = array('I', values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class Dct:
+
+    def __init__(self, path: str):
+        self.path = path
+
+        self.__fp = open(path, 'rb')
+        try:
+            self.__buffer = mmap.mmap(self.__fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            self.__buffer = self.__fp.read()
+
+        try:
+            magic, version, count, hashed, heap_size = _HEADER.unpack_from(self.__buffer, 0)
+        except struct.error:
+            magic, version, count, hashed, heap_size = b'', 0, 0, 0, 0
+
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise Exception('Unsupported dictionary format')
+
+        offset = _HEADER.size
+
+        self.__count = count
+        self.sids = _column(self.__buffer, offset, count)
+        offset += count * 4
+
+        self.__records = offset
+        offset += count * _RECORD.size
+
+        self.hashes = _column(self.__buffer, offset, hashed)
+        offset += hashed * 4
+
+        self.hash_rows = _column(self.__buffer, offset, hashed)
+        offset += hashed * 4
+
+        self.__heap = offset
+
+        # (rows, lowercase sources) of the translated records, decoded on the first find
+        self.__lower = None
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __text(self, offset: int, length: int) -> str:
+        start = self.__heap + offset
+        return self.__buffer[start:start + length].decode('utf-8')
+
+    def __bytes(self, offset: int, length: int) -> bytes:
+        start = self.__heap + offset
+        return self.__buffer[start:start + length]
+
+    def record(self, row: int) -> tuple:
+        s_offset, s_length, t_offset, t_length, c_offset, c_length = _RECORD.unpack_from(
+            self.__buffer, self.__records + row * _RECORD.size)
+        return (self.sids[row],
+                self.__text(s_offset, s_length),
+                self.__text(t_offset, t_length),
+                self.__text(c_offset, c_length))
+
+    def __iter__(self):
+        for row in range(self.__count):
+            yield self.record(row)
+
+    def search(self, sid: int) -> list:
+        sids = self.sids
+        return [self.record(row) for row in range(bisect_left(sids, sid), bisect_right(sids, sid))]
+
+    def translations(self, source: str) -> list:
+        value = source.encode('utf-8')
+        hashes = self.hashes
+        h = source_hash(value)
+
+        translations = []
+        for i in range(bisect_left(hashes, h), bisect_right(hashes, h)):
+            row = self.hash_rows[i]
+            s_offset, s_length, t_offset, t_length, _, _ = _RECORD.unpack_from(
+                self.__buffer, self.__records + row * _RECORD.size)
+            if s_length == len(value) and self.__bytes(s_offset, s_length) == value:
+                translations.append(self.__text(t_offset, t_length))
+        return translations
+
+    def sources(self):
+        # sources of the translated records, only the source text is decoded
+        records = self.__records
+        for row in self.hash_rows:
+            s_offset, s_length = _SOURCE.unpack_from(self.__buffer, records + row * _RECORD.size)
+            yield self.__text(s_offset, s_length)
+
+    def find(self, text: str) -> list:
+        # (source, translate) of the translated records whose lowercase source contains the text
+        if self.__lower is None:
+            self.__lower = self.__lowercase()
+        rows, sources = self.__lower
+
+        found = []
+        for row, source in zip(rows, sources):
+            if text in source:
+                s_offset, s_length, t_offset, t_length, _, _ = _RECORD.unpack_from(
+                    self.__buffer, self.__records + row * _RECORD.size)
+                found.append((self.__text(s_offset, s_length), self.__text(t_offset, t_length)))
+        return found
+
+    def __lowercase(self) -> tuple:
+        rows = array('I')
+        sources = []
+        for row, (s_offset, s_length, t_offset, t_length, _, _) in enumerate(_RECORD.iter_unpack(
+                self.__buffer[self.__records:self.__records + self.__count * _RECORD.size])):
+            if not s_length:
+                continue
+            source = self.__bytes(s_offset, s_length)
+            if source != self.__bytes(t_offset, t_length):
+                rows.append(row)
+                sources.append(source.decode('utf-8').lower())
+        return rows, sources
+
+    def close(self) -> None:
+        self.__lower = None
+        self.sids = None
+        self.hashes = None
+        self.hash_rows = None
+        if isinstance(self.__buffer, mmap.mmap):
+            try:
+                self.__buffer.close()
+            except BufferError:
+                pass
+        self.__buffer = b''
+        self.__fp.close()
+
+    @classmethod
+    def read(cls, path: str) -> 'Dct':
+        return cls(path)
+
+    @staticmethod
+    def write(path: str, items: list) -> None:
+        # items are [sid, source, translate, comment], the source index only keeps translated records
+        items = sorted(items, key=lambda item: item[0])
+
+        heap = io.BytesIO()
+        strings = {}
+
+        def put(value: str) -> tuple:
+            entry = strings.get(value)
+            if entry is None:
+                data = value.encode('utf-8') if value else b''
+                entry = strings[value] = (heap.tell(), len(data), data)
+                heap.write(data)
+            return entry
+
+        sids = array('I')
+        records = []
+        hashed = []
+
+        for row, (sid, source, translate, comment) in enumerate(items):
+            source_entry = put(source)
+            translate_entry = put(translate)
+            comment_entry = put(comment)
+
+            sids.append(sid)
+            records.append(_RECORD.pack(source_entry[0], source_entry[1], translate_entry[0], translate_entry[1],
+                                        comment_entry[0], comment_entry[1]))
+
+            if source and source != translate:
+                hashed.append((source_hash(source_entry[2]), row))
+
+        hashed.sort()
+
+        heap = heap.getvalue()
+
+        with open(path, 'wb') as fp:
+            fp.write(_HEADER.pack(MAGIC, VERSION, len(items), len(hashed), len(heap)))
+            fp.write(_pack_column(sids))
+            fp.write(b''.join(records))
+            fp.write(_pack_column(array('I', (h for h, _ in hashed))))
+            fp.write(_pack_column(array('I', (row for _, row in hashed))))
+            fp.write(heap)
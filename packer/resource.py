@@ -86,8 +86,7 @@ class ResourceID(namedtuple('ResourceID', 'group instance type')):
 
     @property
     def base_instance(self) -> int:
-        hex_inst = self.hex_instance
-        return int(hex_inst[4:], 16)
+        return self.instance & 0x00FFFFFFFFFFFFFF
 
     @property
     def is_stbl(self) -> bool:
@@ -96,24 +95,23 @@ class ResourceID(namedtuple('ResourceID', 'group instance type')):
     @property
     def language(self) -> Union[str, None]:
         if self.type == 0x220557DA:
-            code = '0x{id:016X}'.format(id=self.instance)[:4]
-            language = languages.by_code(code)
+            language = languages.by_id(self.instance >> 56)
             return language.locale if language else None
         return None
 
     @property
     def language_code(self) -> Union[str, None]:
         if self.type == 0x220557DA:
-            return '0x{id:016X}'.format(id=self.instance)[:4]
+            return '0x{code:02X}'.format(code=self.instance >> 56)
         return None
 
     def convert_group(self, highbit: bool = False):
-        group = ('8' if highbit else '0') + self.str_group[1:]
-        return self._replace(group=int(group, 16))
+        group = (self.group & 0x0FFFFFFF) | (0x80000000 if highbit else 0)
+        return self._replace(group=group)
 
     def convert_instance(self, locale: str = None):
         if not locale:
             locale = config.value('translation', 'destination')
         language = languages.by_locale(locale)
-        instance = int(language.code + self.str_instance[2:], 16)
+        instance = language.id << 56 | self.base_instance
         return self._replace(instance=instance)
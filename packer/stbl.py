@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 
-from packer import Packer
+import struct
+
+
+_HEADER = struct.Struct('<4sHBQ2xI')
+_ENTRY = struct.Struct('<IBH')
 
 
 class Stbl:
@@ -11,71 +15,86 @@ class Stbl:
 
         self._strings = {}
 
+        self.__index = None
+        self.__parsed = None
+
     @property
     def language(self):
         return self.rid.language
 
-    @property
-    def strings(self):
-        if self.value is None:
-            return {}
-
-        f = Packer(self.value, mode='r')
-
-        if f.get_raw_bytes(4) != b'STBL':
-            return {}
-
-        version = f.get_uint16()
-        if version != 5:
-            return {}
-
-        _compressed = f.get_uint8()
-        num_entries = f.get_uint64()
+    def __parse(self, decode):
+        index = {}
+        strings = {}
 
-        f.seek += 2
-
-        _strings_length = f.get_uint32()
-
-        _strings = {}
-
-        get_uint32 = f.get_uint32
+        if self.value is None:
+            return index, strings
+
+        data = self.value if isinstance(self.value, bytes) else bytes(self.value)
+
+        try:
+            magic, version, _compressed, num_entries, _strings_length = _HEADER.unpack_from(data, 0)
+        except struct.error:
+            return index, strings
+
+        if magic != b'STBL' or version != 5:
+            return index, strings
+
+        offset = _HEADER.size
+        unpack_entry = _ENTRY.unpack_from
+        entry_size = _ENTRY.size
+
+        try:
+            for _ in range(num_entries):
+                key, _flags, length = unpack_entry(data, offset)
+                offset += entry_size
+                if offset + length > len(data):
+                    break
+                if decode:
+                    strings[key] = data[offset:offset + length].decode('utf-8')
+                else:
+                    index[key] = (offset, length)
+                offset += length
+        except struct.error:
+            pass
+
+        return index, strings
 
-        for i in range(num_entries):
-            key = get_uint32()
-            _flags = f.get_uint8()
-            length = f.get_uint16()
-            val = f.get_raw_bytes(length).decode('utf-8')
-            _strings[key] = val
+    @property
+    def index(self):
+        if self.__index is None:
+            self.__index = self.__parse(decode=False)[0]
+        return self.__index
 
-        return _strings
+    @property
+    def strings(self):
+        if self.__parsed is None:
+            self.__parsed = self.__parse(decode=True)[1]
+        return self.__parsed
+
+    def get(self, key, default=None):
+        if self.__parsed is not None:
+            return self.__parsed.get(key, default)
+        entry = self.index.get(key)
+        if entry is None:
+            return default
+        offset, length = entry
+        return bytes(self.value[offset:offset + length]).decode('utf-8')
 
     @property
     def binary(self):
-        f = Packer(b'', mode='w')
-
-        f.put_raw_bytes(b'STBL')
-        f.put_uint16(5)
-        f.put_uint8(0)
-
-        num_entries = len(self._strings)
-        f.put_uint64(num_entries)
-
-        f.seek += 2
+        values = [value.encode('utf-8') for value in self._strings.values()]
 
-        strings_length = num_entries
-        for key, value in self._strings.items():
-            strings_length += len(value.encode('utf-8'))
+        num_entries = len(values)
+        strings_length = num_entries + sum(map(len, values))
 
-        f.put_uint32(strings_length)
+        parts = [_HEADER.pack(b'STBL', 5, 0, num_entries, strings_length)]
 
-        for key, value in self._strings.items():
-            f.put_uint32(key)
-            f.put_int8(0)
-            _value = value.encode('utf-8')
-            f.put_uint16(len(_value))
-            f.put_raw_bytes(_value)
+        pack_entry = _ENTRY.pack
+        for key, value in zip(self._strings.keys(), values):
+            parts.append(pack_entry(key, 0, len(value)))
+            parts.append(value)
 
-        return f.get_content()
+        return b''.join(parts)
 
     def add(self, key, value):
         self._strings[key] = value.replace("\r", '').replace("\n", '\\n') if value else ''
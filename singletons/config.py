@@ -43,7 +43,9 @@ class ConfigManager:
         'dictionaries': {
             'gamepath': '',
             'dictpath': '',
-            'strong': True
+            'strong': True,
+            'database': False,
+            'fuzzy': 0
         },
         'save': {
             'backup': True,
@@ -75,6 +77,9 @@ class ConfigManager:
             'colorbar': True,
             'numeration': NUMERATION_STANDART
         },
+        'search': {
+            'index': True
+        },
         'temporary': {
             'directory': os.path.abspath(os.path.expanduser('~/Documents'))
         }
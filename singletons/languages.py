@@ -7,7 +7,11 @@ import xml.etree.ElementTree as ElementTree
 from singletons.config import config
 
 
-Language = namedtuple('Language', 'locale code google deepl')
+class Language(namedtuple('Language', 'locale code google deepl')):
+
+    @property
+    def id(self) -> int:
+        return int(self.code, 16)
 
 
 class Languages:
@@ -15,6 +19,7 @@ class Languages:
     def __init__(self) -> None:
         self.__locales = {}
         self.__codes = {}
+        self.__ids = {}
         self.__load()
 
     def __load(self):
@@ -39,6 +44,7 @@ class Languages:
                 lang = Language(locale.upper(), code, item.get('google-code'), item.get('deepl-code'))
                 self.__locales[lang.locale] = lang
                 self.__codes[lang.code] = lang
+                self.__ids[lang.id] = lang
 
     @property
     def locales(self) -> list:
@@ -58,5 +64,8 @@ class Languages:
     def by_code(self, code: str) -> Language:
         return self.__codes.get(code)
 
+    def by_id(self, code: int) -> Language:
+        return self.__ids.get(code)
+
 
 languages = Languages()
@@ -21,6 +21,7 @@ class UndoRecord(namedtuple('UndoRecord', 'items modified')):
             item[0].translate_old = item[2]
             item[0].comment = item[3]
             item[0].flag = item[4]
+            item[0].source_old = item[5]
 
 
 class Undo:
@@ -36,7 +37,7 @@ class Undo:
         return len(self.__records) > 0
 
     def wrap(self, item: MainRecord) -> None:
-        self.__wrapper.append((item, item.translate, item.translate_old, item.comment, item.flag))
+        self.__wrapper.append((item, item.translate, item.translate_old, item.comment, item.flag, item.source_old))
 
     def commit(self) -> None:
         if not self.__wrapper:
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import zlib
+from typing import List, Union
+
+from packer.dbpf import DbpfPackage
+from packer.stbl import Stbl
+
+
+CACHE_VERSION = 2
+
+
+def file_state(path: str) -> list:
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class BuildCache:
+
+    def __init__(self, path: str) -> None:
+        # the header keeps the state of the packages and the locators of their tables,
+        # the strings of every table are kept in a file of their own and only read to build the dictionary
+        self.path = path
+        self.directory = os.path.splitext(path)[0]
+
+        self.__entries = self.__read()
+        self.__modified = False
+
+        # strings of the tables parsed in this run, written on save
+        self.__parsed = {}
+
+    def __read(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as fp:
+                entries = json.load(fp)
+        except (IOError, OSError, ValueError):
+            return {}
+
+        if not isinstance(entries, dict) or entries.get('version') != CACHE_VERSION:
+            return {}
+
+        return entries
+
+    def __filename(self, side: str, key: str) -> str:
+        return os.path.join(self.directory, '{}-{}.strings'.format(side, key))
+
+    def refresh(self, side: str, path: str, language: str) -> bool:
+        # parses the stbls of the language that moved since the last build, returns if the package changed
+        state = file_state(path)
+
+        entry = self.__entries.get(side)
+        if entry is not None and entry['language'] != language:
+            entry = None
+
+        # parsed again when the strings of a table are gone
+        if entry is not None and not all(os.path.exists(self.__filename(side, key)) for key, _ in entry['tables']):
+            entry = None
+
+        if entry is not None and entry['path'] == path and entry['state'] == state:
+            return False
+
+        with DbpfPackage.read(path, memory_map=True) as dbfile:
+            fingerprint = dbfile.fingerprint()
+
+            if entry is not None and entry['hash'] == fingerprint:
+                entry['path'] = path
+                entry['state'] = state
+                self.__modified = True
+                return False
+
+            cached = {key: locator for key, locator in entry['tables']} if entry is not None else {}
+
+            tables = []
+
+            for rid in dbfile.search_stbl():
+                if rid.language != language:
+                    continue
+
+                resource = dbfile[rid]
+                key = '{:08x}{:016x}'.format(rid.group, rid.instance)
+                locator = [resource.locator.offset, resource.locator.length, *resource.locator.compression,
+                           resource.size]
+
+                if cached.get(key) != locator:
+                    stbl = Stbl(rid=rid, value=resource.content)
+                    self.__parsed[(side, key)] = [[sid, value] for sid, value in stbl.strings.items() if value]
+
+                tables.append([key, locator])
+
+        self.__entries[side] = {
+            'path': path,
+            'language': language,
+            'state': state,
+            'hash': fingerprint,
+            'tables': tables
+        }
+        self.__modified = True
+
+        return True
+
+    def strings(self, side: str) -> List[List[list]]:
+        # [[sid, value], ...] of every table of the side in index order
+        entry = self.__entries.get(side)
+        if entry is None:
+            return []
+
+        tables = []
+
+        for key, _ in entry['tables']:
+            strings = self.__parsed.get((side, key))
+            if strings is None:
+                strings = self.__load(side, key)
+            if strings is None:
+                # a damaged table, the package is parsed again in this build
+                del self.__entries[side]
+                self.refresh(side, entry['path'], entry['language'])
+                return self.strings(side)
+            tables.append(strings)
+
+        return tables
+
+    def __load(self, side: str, key: str) -> Union[List[list], None]:
+        try:
+            with open(self.__filename(side, key), 'rb') as fp:
+                strings = json.loads(zlib.decompress(fp.read()).decode('utf-8'))
+        except (IOError, OSError, ValueError, zlib.error):
+            return None
+        return strings if isinstance(strings, list) else None
+
+    def built(self, path: str) -> bool:
+        return os.path.exists(path) and self.__entries.get('dictionary') == file_state(path)
+
+    def update(self, path: str) -> None:
+        self.__entries['dictionary'] = file_state(path)
+        self.__modified = True
+
+    def save(self) -> None:
+        if not self.__modified:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        for (side, key), strings in self.__parsed.items():
+            with open(self.__filename(side, key), 'wb') as fp:
+                fp.write(zlib.compress(json.dumps(strings, ensure_ascii=False).encode('utf-8')))
+
+        self.__parsed.clear()
+
+        # tables no longer in the packages are dropped
+        kept = {self.__filename(side, key) for side, entry in self.__entries.items() if isinstance(entry, dict)
+                for key, _ in entry['tables']}
+        for filename in os.listdir(self.directory):
+            filename = os.path.join(self.directory, filename)
+            if filename.endswith('.strings') and filename not in kept:
+                os.remove(filename)
+
+        self.__entries['version'] = CACHE_VERSION
+
+        with open(self.path, 'w', encoding='utf-8') as fp:
+            json.dump(self.__entries, fp)
+
+        self.__modified = False
@@ -95,7 +95,7 @@ class Container:
 
         flag = None
 
-        with DbpfPackage.read(filename) as dbfile:
+        with DbpfPackage.read(filename, memory_map=True) as dbfile:
             for rid in dbfile.search_stbl():
                 stbl = Stbl(rid=rid, value=dbfile[rid].content)
                 language = rid.language
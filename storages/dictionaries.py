@@ -1,51 +1,102 @@
 # -*- coding: utf-8 -*-
 
 import os
-import zlib
-import json
 import glob
-from PySide6.QtCore import QObject, Signal, QThreadPool, QRunnable
+import logging
+from threading import Thread, Lock, RLock
+from queue import SimpleQueue
+from typing import List, Tuple, Union
+from concurrent.futures import Future
+from PySide6.QtCore import QObject, Signal, Slot
 
 from packer import Packer
+from packer.dct import Dct, upgrade, read_items
+
+from .fuzzy import FuzzyIndex
+from .memory import open_memory
 
 from models.dictionary import Model, ProxyModel
 
 from singletons.config import config
-from singletons.interface import interface
-from singletons.signals import progress_signals, storage_signals
+from singletons.signals import storage_signals
 from singletons.state import app_state
 from utils.functions import text_to_stbl
 from utils.constants import *
 
 
+logger = logging.getLogger(__name__)
+
+
 class StorageSignals(QObject):
     updated = Signal()
 
 
-class UpdaterWorker(QRunnable):
+class LoaderNotifier(QObject):
+    loaded = Signal()
+    indexed = Signal()
 
-    def __init__(self, item):
+    def __init__(self, storage):
         super().__init__()
 
-        self.item = item
+        self.storage = storage
 
-        self.signals = StorageSignals()
+        self.loaded.connect(self.finish)
+        self.indexed.connect(self.finish_index)
 
-    def run(self):
-        source = text_to_stbl(self.item.source)
-        translate = text_to_stbl(self.item.translate)
-        found = self._update_or_append(source, translate)
-        if not found:
-            app_state.dictionaries_storage.model.append(['-', source, translate, len(source)])
-        storage_signals.updated.emit()
+    @Slot()
+    def finish(self) -> None:
+        self.storage.finish()
+
+    @Slot()
+    def finish_index(self) -> None:
+        self.storage.finish_index()
+
+
+class DaemonExecutor:
+    # runs jobs in submission order like ThreadPoolExecutor, but on daemon threads,
+    # so a load still running does not keep the application open on exit
+
+    def __init__(self, max_workers: int) -> None:
+        self.__jobs = SimpleQueue()
+        self.__workers = max_workers
+
+        for _ in range(max_workers):
+            Thread(target=self.__work, daemon=True).start()
+
+    def submit(self, function, *args) -> Future:
+        future = Future()
+        self.__jobs.put((future, function, args))
+        return future
 
-    @staticmethod
-    def _update_or_append(source, translate):
-        for model_item in app_state.dictionaries_storage.model.items:
-            if model_item[RECORD_DICTIONARY_SOURCE] == source and model_item[RECORD_DICTIONARY_PACKAGE] == '-':
-                model_item[RECORD_DICTIONARY_TRANSLATE] = translate
-                return True
-        return False
+    def shutdown(self) -> None:
+        for _ in range(self.__workers):
+            self.__jobs.put(None)
+
+    def __work(self) -> None:
+        while True:
+            job = self.__jobs.get()
+            if job is None:
+                return
+
+            future, function, args = job
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(function(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+
+
+def parse_dictionary(filename: str) -> Union[Dct, list, None]:
+    try:
+        with open(filename, 'rb') as fp:
+            packer = Packer(fp.read(4), mode='r')
+
+        if packer.get_raw_bytes(3) == b'DCT' and packer.get_byte() == DICTIONARY_VERSION:
+            return Dct.read(filename)
+
+        return read_items(filename)
+    except (IOError, OSError, Exception):
+        return None
 
 
 class DictionariesStorage:
@@ -61,88 +112,308 @@ class DictionariesStorage:
 
         self.loaded = False
 
+        # done once every dictionary is indexed, the model rows are added on the gui thread afterwards
+        self.ready: Union[Future, None] = None
+
+        # translation memory database, used instead of the in-memory indexes when enabled
+        self.memory = None
+
         self.signals = StorageSignals()
 
         self.__sid = {}
         self.__sources = {}
         self.__hash = {}
 
-        self.__pool = QThreadPool()
+        # one shared object per distinct text while loading
+        self.__strings = {}
+
+        # indexed dictionaries are searched in place, saving swaps them from the pool threads under the lock
+        self.__dictionaries: List[Tuple[str, Dct]] = []
+        self.__lock = RLock()
+
+        # sources similar to a text, built after the other indexes when enabled
+        self.fuzzy: Union[Future, None] = None
+
+        # source -> model row of the entries edited in this session
+        self.__edited = {}
+
+        # dictionaries are written one at a time, a save may wait for the load on its thread
+        self.__saving = Lock()
+
+        # set when the dictionaries are rebuilt during a load, they are read again once it finished
+        self.__reload = False
+
+        self.__notifier = LoaderNotifier(self)
+
+    @property
+    def available(self) -> bool:
+        return self.ready is not None and self.ready.done()
+
+    @property
+    def indexing(self) -> bool:
+        return self.fuzzy is not None and not self.fuzzy.done()
 
     def search(self, sid: int = None, source: str = None) -> list:
+        if not self.available:
+            return []
+
+        if self.memory is not None:
+            return self.memory.search(sid=sid, source=source)
+
         if sid:
-            return self.__sid.get(sid, [])
+            found = self.__sid.get(sid, [])
+            if self.__dictionaries:
+                with self.__lock:
+                    found = found + [(name, s, t, c) for name, dictionary in self.__dictionaries
+                                     for _, s, t, c in dictionary.search(sid) if s and s != t]
+            return found
         elif source:
-            return self.__sources.get(source, [])
+            translations = self.__sources.get(source)
+            found = list(translations) if translations else []
+            if self.__dictionaries:
+                with self.__lock:
+                    for _, dictionary in self.__dictionaries:
+                        found.extend(dictionary.translations(source))
+                found = list(dict.fromkeys(found))
+            return found
         return []
 
-    def load(self):
+    def similar(self, source: str, limit: int = 5) -> list:
+        threshold = config.value('dictionaries', 'fuzzy')
+        if not threshold or not self.available:
+            return []
+
+        fuzzy = self.index()
+        # a failed build was logged when it finished, there is nothing to match against
+        if not fuzzy.done() or fuzzy.exception() is not None:
+            return []
+
+        found = []
+        for score, matched in fuzzy.result().search(source, limit, threshold / 100):
+            translations = self.search(source=matched)
+            if translations:
+                found.append((score, matched, translations[0]))
+        return found
+
+    def find(self, text: str) -> list:
+        if not self.loaded:
+            return []
+
+        rows = [i for i in self.model.items if text in str(i[RECORD_DICTIONARY_SOURCE]).lower()]
+
+        # indexed dictionaries are scanned in place instead of being kept in the model
+        if self.__dictionaries:
+            seen = {(row[RECORD_DICTIONARY_SOURCE], row[RECORD_DICTIONARY_TRANSLATE]) for row in rows}
+            with self.__lock:
+                for name, dictionary in self.__dictionaries:
+                    for source, translate in dictionary.find(text):
+                        if (source, translate) not in seen:
+                            seen.add((source, translate))
+                            rows.append([name, source, translate, len(source)])
+
+        if self.memory is not None:
+            rows += self.memory.find(text)
+        return rows
+
+    def load(self) -> Future:
+        if self.ready is not None:
+            return self.ready
+
         dictionary_files = glob.glob(os.path.join(self.directory, '*.dct'))
 
-        if dictionary_files:
-            progress_signals.initiate.emit(interface.text('System', 'Loading dictionaries...'), len(dictionary_files))
+        if config.value('dictionaries', 'database') and self.memory is None and os.path.isdir(self.directory):
+            self.memory = open_memory(self.directory)
+
+        executor = DaemonExecutor(max_workers=max(1, min(len(dictionary_files), os.cpu_count() or 1)))
+
+        if self.memory is not None:
+            self.ready = executor.submit(self.__sync)
+        else:
+            # files are parsed in parallel and merged in glob order, the merge is queued after every parse
+            parsed = [(os.path.splitext(os.path.basename(filename))[0], executor.submit(parse_dictionary, filename))
+                      for filename in dictionary_files]
+            self.ready = executor.submit(self.__merge, parsed)
+
+        executor.shutdown()
+
+        # the index is started first, so the packages resolved on load are kept for it
+        if config.value('dictionaries', 'fuzzy'):
+            self.index()
+
+        self.ready.add_done_callback(lambda _: self.__notifier.loaded.emit())
+
+        return self.ready
+
+    def reload(self) -> None:
+        # reads the dictionaries again after they were rebuilt, the edits of the session are kept
+        if self.ready is None:
+            return
+
+        if not self.ready.done():
+            self.__reload = True
+            return
+
+        with self.__lock:
+            for _, dictionary in self.__dictionaries:
+                dictionary.close()
+            self.__dictionaries = []
+
+        # a fuzzy index still building keeps the old indexes, its result is dropped
+        self.__sid = {}
+        self.__sources = {}
+        self.__hash = {}
+        self.__strings = {}
+
+        if self.memory is not None and not config.value('dictionaries', 'database'):
+            self.memory.close()
+            self.memory = None
+
+        self.model.replace(list(self.__edited.values()))
+
+        self.ready = None
+        self.fuzzy = None
+        self.loaded = False
+
+        self.load()
+
+    def index(self) -> Future:
+        if self.fuzzy is None:
+            executor = DaemonExecutor(max_workers=1)
+            self.fuzzy = executor.submit(self.__build_fuzzy)
+            executor.shutdown()
+
+            self.fuzzy.add_done_callback(self.__indexed)
+
+        return self.fuzzy
+
+    def __indexed(self, future: Future) -> None:
+        if future.exception() is not None:
+            logger.error('Building the fuzzy index failed', exc_info=future.exception())
+        self.__notifier.indexed.emit()
+
+    def __sync(self) -> None:
+        self.memory.sync(self.directory)
 
-            for filename in dictionary_files:
-                dictionary_name = os.path.splitext(os.path.basename(filename))[0]
+    def __merge(self, parsed: list) -> None:
+        for dictionary_name, future in parsed:
+            result = future.result()
+            if isinstance(result, Dct):
+                self.__attach(dictionary_name, result)
+            elif result:
+                self.__read(dictionary_name.lower(), result)
 
-                with open(filename, 'rb') as fp:
-                    packer = Packer(fp.read(), mode='r')
+    def __build_fuzzy(self) -> FuzzyIndex:
+        self.ready.result()
 
-                if packer.get_raw_bytes(3) == b'DCT':
-                    version = packer.get_byte()
-                    items = packer.get_json()
-                else:
-                    content = zlib.decompress(packer.get_content()).decode('utf-8')
-                    version = 1
-                    items = json.loads(content)
+        # only the sources are kept, the translation of a match is looked up in the other indexes
+        if self.memory is not None:
+            sources = self.memory.sources()
+        else:
+            sources = list(self.__sources)
+            with self.__lock:
+                dictionaries = list(self.__dictionaries)
+            for entry in dictionaries:
+                with self.__lock:
+                    if entry in self.__dictionaries:
+                        sources.extend(entry[1].sources())
 
-                self.read_dictionary(dictionary_name, version, items)
+        fuzzy = FuzzyIndex()
 
-                progress_signals.increment.emit()
+        seen = set()
+        for source in sources:
+            if source not in seen:
+                seen.add(source)
+                fuzzy.add(source)
 
+        fuzzy.sort()
+
+        return fuzzy
+
+    def finish(self) -> None:
+        if self.__hash:
             self.model.append(list(self.__hash.values()))
-            self.signals.updated.emit()
 
-            self.__hash.clear()
+        self.__hash.clear()
+        self.__strings.clear()
+
+        self.signals.updated.emit()
 
-            progress_signals.finished.emit()
+        if app_state.packages_storage is not None:
+            app_state.packages_storage.resolve()
 
         self.loaded = True
 
-    def read_dictionary(self, dictionary_name: str, version: int, items: list) -> None:
-        name = dictionary_name.lower()
+        if self.__reload:
+            self.__reload = False
+            self.reload()
+
+    def finish_index(self) -> None:
+        self.signals.updated.emit()
 
-        for i, item in enumerate(items):
-            if version == 1:
-                item[0] = int(item[0], 16)
-                item.append(0)
+        if app_state.packages_storage is not None:
+            app_state.packages_storage.resolve()
 
-            if version < 3:
-                item.append('')
+    def open_dictionary(self, dictionary_name: str, filename: str) -> None:
+        try:
+            dictionary = Dct.read(filename)
+        except (IOError, OSError, Exception):
+            return
+        self.__attach(dictionary_name, dictionary)
 
-            if version < 4:
-                item.pop(3)
+    def __attach(self, dictionary_name: str, dictionary: Dct) -> None:
+        with self.__lock:
+            self.__dictionaries.append((dictionary_name.lower(), dictionary))
 
+    def close_dictionary(self, filename: str) -> bool:
+        path = os.path.normcase(os.path.abspath(filename))
+        with self.__lock:
+            found = [d for d in self.__dictionaries if os.path.normcase(os.path.abspath(d[1].path)) == path]
+            for entry in found:
+                self.__dictionaries.remove(entry)
+                entry[1].close()
+        return bool(found)
+
+    def read_dictionary(self, dictionary_name: str, version: int, items: list) -> None:
+        self.__read(dictionary_name.lower(), upgrade(version, items))
+
+    def __read(self, name: str, items: list) -> None:
+        for item in items:
             if item[1] and item[1] != item[2]:
                 self.update_hash(name, item)
 
     def update_hash(self, name: str, item: list):
-        self.__sid.setdefault(item[0], []).append((name, item[1], item[2], item[3]))
+        strings = self.__strings
+        source = strings.setdefault(item[1], item[1])
+        translate = strings.setdefault(item[2], item[2])
+
+        self.__sid.setdefault(item[0], []).append((name, source, translate, item[3]))
 
-        if item[1] not in self.__sources:
-            self.__sources[item[1]] = []
-        if item[2] not in self.__sources[item[1]]:
-            self.__sources[item[1]].append(item[2])
+        self.__sources.setdefault(source, {})[translate] = None
 
-        k = f'{item[1]}__{item[2]}'
+        k = (source, translate)
         if k not in self.__hash:
-            self.__hash[k] = [name, item[1], item[2], len(item[1])]
+            self.__hash[k] = [name, source, translate, len(source)]
 
     def update(self, item):
+        # called by the edit dialog on the gui thread, the model row is updated in place without a worker
         if not item.compare():
-            worker = UpdaterWorker(item)
-            worker.setAutoDelete(True)
-            self.__pool.start(worker)
+            self.apply([(text_to_stbl(item.source), text_to_stbl(item.translate))])
+
+    def apply(self, updates: list) -> None:
+        rows = []
+
+        for source, translate in updates:
+            row = self.__edited.get(source)
+            if row is not None:
+                row[RECORD_DICTIONARY_TRANSLATE] = translate
+            else:
+                row = self.__edited[source] = ['-', source, translate, len(source)]
+                rows.append(row)
+
+        if rows:
+            self.model.append(rows)
+
+        storage_signals.updated.emit()
 
     def save(self, force: bool = False, multi: bool = False):
         storage = app_state.packages_storage
@@ -157,20 +428,10 @@ class DictionariesStorage:
             package.modify(False)
 
     def save_standalone(self, name, items):
-        if not os.path.isdir(self.directory):
-            os.mkdir(self.directory)
-
-        path = os.path.join(self.directory, name + '.dct')
-
-        f = Packer(b'', mode='w')
-
-        f.put_raw_bytes(b'DCT')
-        f.put_byte(DICTIONARY_VERSION)
-
         _items = []
 
         for item in items:
-            if item.flag != FLAG_UNVALIDATED and item.source:
+            if item.flag != FLAG_UNVALIDATED and item.flag != FLAG_FUZZY and item.source:
                 _items.append([
                     item.id,
                     text_to_stbl(item.source),
@@ -178,7 +439,41 @@ class DictionariesStorage:
                     item.comment
                 ])
 
-        f.put_json(_items)
+        self.save_items(name, _items)
+
+    def save_items(self, name: str, items: list) -> None:
+        # the dictionary list must not change under a running load, the save is queued after it
+        # instead of blocking the caller
+        ready = self.ready
+        if ready is not None and not ready.done():
+            ready.add_done_callback(lambda future: self.__save_loaded(future, name, items))
+        else:
+            self.__save(name, items)
+
+    def __save_loaded(self, future: Future, name: str, items: list) -> None:
+        # the items are written even when the load failed, only the loaded dictionaries are missing
+        if future.exception() is not None:
+            logger.error('Loading the dictionaries failed', exc_info=future.exception())
+        self.__save(name, items)
+
+    def __save(self, name: str, items: list) -> None:
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+
+        path = os.path.join(self.directory, name + '.dct')
+
+        with self.__saving:
+            # a mapped file can not be rewritten, it is closed only to be replaced and reopened,
+            # so searches never see the dictionary missing
+            Dct.write(path + '.tmp', items)
+
+            with self.__lock:
+                opened = self.close_dictionary(path)
+
+                os.replace(path + '.tmp', path)
+
+                if opened:
+                    self.open_dictionary(name, path)
 
-        with open(path, 'w+b') as fp:
-            fp.write(f.get_content())
+            if self.memory is not None:
+                self.memory.import_file(name.lower(), path)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import heapq
+import random
+from array import array
+from bisect import bisect_left
+from typing import List, Tuple
+
+from .search import ngrams
+
+
+# minhash signature of BANDS * ROWS values, two sources become candidates when any band is equal.
+# a pair with a trigram jaccard similarity of 0.75 shares a band with a probability of 0.95, 0.5 with 0.4
+BANDS = 8
+ROWS = 4
+BINS = BANDS * ROWS
+
+EMPTY = sys.maxsize
+
+# fixed random order of the bins an empty bin borrows its value from
+DONORS = [random.Random(i).sample(range(BINS), BINS) for i in range(BINS)]
+
+
+def grams(text: str) -> set:
+    return ngrams(' ' + text.casefold() + ' ')
+
+
+def signature(text_grams: set) -> list:
+    # one permutation hashing, every trigram lands in a single bin
+    bins = [EMPTY] * BINS
+    for h in map(hash, text_grams):
+        i = h % BINS
+        value = h // BINS
+        if value < bins[i]:
+            bins[i] = value
+
+    # empty bins of short texts borrow from filled ones, similar texts borrow alike
+    if EMPTY in bins:
+        filled = [value != EMPTY for value in bins]
+        for i in range(BINS):
+            if not filled[i]:
+                for j in DONORS[i]:
+                    if filled[j]:
+                        bins[i] = bins[j]
+                        break
+
+    return bins
+
+
+def bands(text_grams: set) -> list:
+    values = signature(text_grams)
+    return [hash(tuple(values[i:i + ROWS])) for i in range(0, BINS, ROWS)]
+
+
+class FuzzyIndex:
+
+    def __init__(self) -> None:
+        self.sources = []
+
+        # trigram count of every source
+        self.__sizes = array('I')
+
+        # band hash of every source, sorted before the first search
+        self.__keys = [array('q') for _ in range(BANDS)]
+        self.__rows = [array('I') for _ in range(BANDS)]
+        self.__sorted = True
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def add(self, source: str) -> None:
+        source_grams = grams(source)
+        if not source_grams:
+            return
+
+        row = len(self.sources)
+
+        self.sources.append(source)
+        self.__sizes.append(len(source_grams))
+
+        for band, key in enumerate(bands(source_grams)):
+            self.__keys[band].append(key)
+            self.__rows[band].append(row)
+
+        self.__sorted = False
+
+    def sort(self) -> None:
+        for band in range(BANDS):
+            keys = self.__keys[band]
+            rows = self.__rows[band]
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            self.__keys[band] = array('q', map(keys.__getitem__, order))
+            self.__rows[band] = array('I', map(rows.__getitem__, order))
+        self.__sorted = True
+
+    def search(self, text: str, limit: int = 5, threshold: float = 0.75) -> List[Tuple[float, str]]:
+        text_grams = grams(text)
+        size = len(text_grams)
+        if not size or not self.sources:
+            return []
+
+        if not self.__sorted:
+            self.sort()
+
+        candidates = set()
+        for band, key in enumerate(bands(text_grams)):
+            keys = self.__keys[band]
+            rows = self.__rows[band]
+            i = bisect_left(keys, key)
+            while i < len(keys) and keys[i] == key:
+                candidates.add(rows[i])
+                i += 1
+
+        sizes = self.__sizes
+        low = threshold * size
+        high = size / threshold
+
+        found = []
+        for row in candidates:
+            source_size = sizes[row]
+            if source_size < low or source_size > high:
+                continue
+            shared = len(text_grams & grams(self.sources[row]))
+            score = shared / (size + source_size - shared)
+            if score >= threshold:
+                found.append((score, -row))
+
+        return [(score, self.sources[-row]) for score, row in heapq.nlargest(limit, found)]
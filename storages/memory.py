@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+import os
+import glob
+import sqlite3
+import threading
+from typing import Callable, List, Union
+
+from packer.dct import read_items, source_hash
+
+
+SCHEMA_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    dictionary TEXT NOT NULL,
+    sid INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    translate TEXT NOT NULL,
+    comment TEXT,
+    hash INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_sid ON entries (sid);
+CREATE INDEX IF NOT EXISTS entries_hash ON entries (hash);
+CREATE INDEX IF NOT EXISTS entries_dictionary ON entries (dictionary);
+'''
+
+SCHEMA_FTS = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5 (
+    source, content='entries', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, source) VALUES (new.id, new.source);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, source) VALUES ('delete', old.id, old.source);
+END;
+'''
+
+
+class TranslationMemory:
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+        self.__lock = threading.Lock()
+
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.execute('PRAGMA journal_mode = WAL')
+        self.__db.execute('PRAGMA synchronous = NORMAL')
+        self.__db.create_function('contains', 2, lambda source, text: text in source.lower(), deterministic=True)
+
+        version = self.__db.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.__db.executescript('DROP TABLE IF EXISTS entries_fts; DROP TABLE IF EXISTS entries; '
+                                    'DROP TABLE IF EXISTS files;')
+            self.__db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+        self.__db.executescript(SCHEMA)
+
+        try:
+            self.__db.executescript(SCHEMA_FTS)
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__db.close()
+
+    def sync(self, directory: str, progress: Callable = None) -> None:
+        files = {}
+        for filename in glob.glob(os.path.join(directory, '*.dct')):
+            files[os.path.splitext(os.path.basename(filename))[0].lower()] = filename
+
+        with self.__lock:
+            known = {name: (mtime, size) for name, mtime, size in
+                     self.__db.execute('SELECT name, mtime, size FROM files')}
+
+        for name in known.keys() - files.keys():
+            self.remove(name)
+
+        for name, filename in files.items():
+            stat = os.stat(filename)
+            if known.get(name) != (stat.st_mtime, stat.st_size):
+                self.import_file(name, filename)
+            if progress is not None:
+                progress()
+
+    def remove(self, name: str) -> None:
+        with self.__lock, self.__db:
+            self.__db.execute('DELETE FROM entries WHERE dictionary = ?', (name,))
+            self.__db.execute('DELETE FROM files WHERE name = ?', (name,))
+
+    def import_file(self, name: str, filename: str) -> None:
+        stat = os.stat(filename)
+
+        try:
+            items = read_items(filename)
+        except (IOError, OSError, Exception):
+            items = []
+
+        rows = []
+        for sid, source, translate, comment in items:
+            if source and source != translate:
+                rows.append((name, sid, source, translate, comment, source_hash(source.encode('utf-8'))))
+
+        with self.__lock, self.__db:
+            self.__db.execute('DELETE FROM entries WHERE dictionary = ?', (name,))
+            self.__db.executemany('INSERT INTO entries (dictionary, sid, source, translate, comment, hash) '
+                                  'VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self.__db.execute('INSERT OR REPLACE INTO files (name, mtime, size) VALUES (?, ?, ?)',
+                              (name, stat.st_mtime, stat.st_size))
+
+    def search(self, sid: int = None, source: str = None) -> list:
+        with self.__lock:
+            if sid:
+                return self.__db.execute('SELECT dictionary, source, translate, comment FROM entries '
+                                         'WHERE sid = ? ORDER BY id', (sid,)).fetchall()
+            elif source:
+                rows = self.__db.execute('SELECT translate FROM entries WHERE hash = ? AND source = ? ORDER BY id',
+                                         (source_hash(source.encode('utf-8')), source))
+                return list(dict.fromkeys(row[0] for row in rows))
+        return []
+
+    def sources(self) -> List[str]:
+        with self.__lock:
+            rows = self.__db.execute('SELECT source FROM entries WHERE source != translate ORDER BY id').fetchall()
+        return [row[0] for row in rows]
+
+    def find(self, text: str) -> List[list]:
+        with self.__lock:
+            if self.fts and len(text) >= 3:
+                rows = self.__db.execute('SELECT dictionary, source, translate FROM entries WHERE id IN '
+                                         '(SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?) ORDER BY id',
+                                         ('"' + text.replace('"', '""') + '"',)).fetchall()
+            else:
+                rows = self.__db.execute('SELECT dictionary, source, translate FROM entries '
+                                         'WHERE contains(source, ?) ORDER BY id', (text,)).fetchall()
+
+        found = {}
+        for name, source, translate in rows:
+            if text in source.lower() and (source, translate) not in found:
+                found[(source, translate)] = [name, source, translate, len(source)]
+        return list(found.values())
+
+
+def open_memory(directory: str) -> Union[TranslationMemory, None]:
+    try:
+        return TranslationMemory(os.path.join(directory, 'dictionaries.db'))
+    except sqlite3.Error:
+        return None
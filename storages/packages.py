@@ -7,7 +7,7 @@ import gc
 import json
 import xml.etree.ElementTree as ElementTree
 from json import JSONDecodeError
-from PySide6.QtCore import QObject, Signal
+from PySide6.QtCore import QObject, Signal, QThreadPool
 from PySide6.QtWidgets import QApplication
 from typing import Union, Dict, List
 from pathlib import Path
@@ -17,7 +17,8 @@ from packer.resource import ResourceID
 from packer.stbl import Stbl
 
 from .container import Container
-from .records import MainRecord
+from .records import MainRecord, RecordStore
+from .search import SearchIndex, IndexWorker
 
 from models.main import Model, ProxyModel
 
@@ -30,10 +31,30 @@ from utils.functions import text_to_stbl, compare, fnv64, prettify, create_tempo
 from utils.constants import *
 
 
+def merge_stbl(dbfile, outpkg, instances: list, stbl: Dict[ResourceID, Stbl], language: str, increment=None) -> None:
+    # destination tables of the package are replaced by the edited ones with the same group and instance,
+    # other resources are copied, the matched tables are taken out of stbl
+    pending = {(r.group, r.instance): r for r in stbl.keys()}
+
+    for rid in instances:
+        if rid.language == language:
+            r = pending.pop((rid.group, rid.instance), None)
+            if r is not None:
+                outpkg.put(r, stbl.pop(r).binary)
+        else:
+            resource = dbfile[rid]
+            if resource.size:
+                outpkg.copy(resource)
+
+        if increment is not None:
+            increment()
+
+
 class StorageSignals(QObject):
     loaded = Signal(list)
     closed = Signal(str)
     cleared = Signal()
+    updated = Signal()
 
 
 class PackagesStorage:
@@ -41,12 +62,25 @@ class PackagesStorage:
     def __init__(self) -> None:
         self.packages: List[Container] = []
 
+        self.records = RecordStore()
+
+        self.__by_package: Dict[str, List[MainRecord]] = {}
+        self.__by_instance: Dict[int, List[MainRecord]] = {}
+
+        self.search_index = None
+
+        # packages opened before the dictionaries were ready
+        self.__unresolved: List[str] = []
+
         self.model = Model()
         self.proxy = ProxyModel()
         self.proxy.setSourceModel(self.model)
 
         self.signals = StorageSignals()
 
+        self.__pool = QThreadPool()
+        self.__pool.setMaxThreadCount(1)
+
     def find(self, key: str) -> Union[Container, None]:
         for package in self.packages:
             if package.key == key:
@@ -86,24 +120,88 @@ class PackagesStorage:
             package.modify(state)
 
     def items(self, key: str = None, instance: int = 0) -> List[MainRecord]:
-        items = self.model.items
+        if not key and not instance:
+            key = app_state.current_package
+            instance = app_state.current_instance
 
-        if key or instance:
-            if instance > 0:
-                items = [i for i in items if i.instance == instance]
-            elif key:
-                items = [i for i in items if i.package == key]
+        if instance > 0:
+            return self.__by_instance.get(instance, [])
+        elif key:
+            return self.__by_package.get(key, [])
 
-        else:
-            package_key = app_state.current_package
-            package_instance = app_state.current_instance
+        return self.model.items
 
-            if package_instance > 0:
-                items = [i for i in items if i.instance == package_instance]
-            elif package_key:
-                items = [i for i in items if i.package == package_key]
+    def __index(self, items: List[MainRecord]) -> None:
+        for item in items:
+            self.__by_package.setdefault(item.package, []).append(item)
+            self.__by_instance.setdefault(item.instance, []).append(item)
+
+    def __build_index(self) -> None:
+        if self.search_index is not None and self.search_index.records is not self.records:
+            self.search_index.cancel()
+            self.search_index = None
+
+        if not config.value('search', 'index'):
+            return
+
+        if self.search_index is None:
+            self.search_index = SearchIndex(self.records)
 
-        return items
+        worker = IndexWorker(self.search_index)
+        worker.setAutoDelete(True)
+        self.__pool.start(worker)
+
+    @staticmethod
+    def match(name: str, sid: int, source: str, comment: str, strong_dict: bool) -> Union[tuple, None]:
+        dictionaries_storage = app_state.dictionaries_storage
+
+        _translated = dictionaries_storage.search(sid=sid)
+        if _translated:
+            translated = [t for t in _translated if t[0].lower() == name.lower()]
+            if not translated and not strong_dict:
+                translated = _translated
+            if translated:
+                tr = translated[0]
+                flag = FLAG_PROGRESS if len(translated) > 1 else FLAG_TRANSLATED
+                old = tr[1] if not compare(tr[1], source) else None
+                return tr[2], tr[3], flag, old
+        elif not strong_dict:
+            _translated = dictionaries_storage.search(source=source)
+            if _translated:
+                flag = FLAG_PROGRESS if len(_translated) > 1 else FLAG_TRANSLATED
+                return _translated[0], comment, flag, None
+            similar = dictionaries_storage.similar(source, 1)
+            if similar:
+                _, matched, translate = similar[0]
+                return translate, comment, FLAG_FUZZY, matched
+
+        return None
+
+    def resolve(self) -> None:
+        keys = self.__unresolved
+
+        # the packages are matched again once the fuzzy index is built
+        self.__unresolved = list(keys) if app_state.dictionaries_storage.indexing else []
+
+        strong_dict = config.value('dictionaries', 'strong')
+
+        resolved = False
+
+        for key in keys:
+            package = self.find(key)
+            if package is None:
+                continue
+
+            for item in self.__by_package.get(key, []):
+                if item.flag != FLAG_UNVALIDATED:
+                    continue
+                matched = self.match(package.name, item.id, item.source, item.comment, strong_dict)
+                if matched is not None:
+                    item.translate, item.comment, item.flag, item.source_old = matched
+                    resolved = True
+
+        if resolved:
+            self.signals.updated.emit()
 
     def load(self, files: Union[list, str], added: bool = False) -> None:
         if not isinstance(files, list):
@@ -122,8 +220,10 @@ class PackagesStorage:
         loaded = []
         items = []
         empty = []
+        unresolved = []
 
-        dictionaries_storage = app_state.dictionaries_storage
+        dictionaries_ready = app_state.dictionaries_storage.available
+        dictionaries_indexing = app_state.dictionaries_storage.indexing
         strong_dict = config.value('dictionaries', 'strong')
         group_original = config.value('group', 'original')
         group_highbit = config.value('group', 'highbit')
@@ -158,34 +258,16 @@ class PackagesStorage:
 
                     if not package.is_package:
                         flag = FLAG_TRANSLATED
-                    else:
-                        _translated = dictionaries_storage.search(sid=sid)
-                        if _translated:
-                            translated = [t for t in _translated if t[0].lower() == package.name.lower()]
-                            if not translated and not strong_dict:
-                                translated = _translated
-                            if translated:
-                                tr = translated[0]
-                                dest = tr[2]
-                                comment = tr[3]
-                                flag = FLAG_TRANSLATED
-                                if len(translated) > 1:
-                                    flag = FLAG_PROGRESS
-                                if not compare(tr[1], source):
-                                    old = tr[1]
-                        elif not strong_dict:
-                            _translated = dictionaries_storage.search(source=source)
-                            if _translated:
-                                dest = _translated[0]
-                                flag = FLAG_TRANSLATED
-                                if len(_translated) > 1:
-                                    flag = FLAG_PROGRESS
+                    elif dictionaries_ready:
+                        matched = self.match(package.name, sid, source, comment, strong_dict)
+                        if matched is not None:
+                            dest, comment, flag, old = matched
 
                     __rid = rid
                     if not group_original:
                         __rid = rid.convert_group(highbit=group_highbit)
 
-                    items.append(MainRecord(
+                    items.append(self.records.append(
                         idx_all,
                         sid,
                         __rid.instance,
@@ -206,11 +288,22 @@ class PackagesStorage:
                 self.packages.append(package)
                 loaded.append(package.key)
 
+                if package.is_package and (not dictionaries_ready or dictionaries_indexing):
+                    unresolved.append(package.key)
+
             else:
                 empty.append(package.name)
 
         if items:
+            self.__index(items)
             self.model.append(items)
+            self.__build_index()
+
+        # the dictionaries may have finished loading while the progress was processing events,
+        # before these packages were indexed
+        self.__unresolved.extend(unresolved)
+        if self.__unresolved and app_state.dictionaries_storage.available:
+            self.resolve()
 
         progress_signals.finished.emit()
 
@@ -305,7 +398,7 @@ class PackagesStorage:
 
         with DbpfPackage.write(path) as outpkg:
             for rid, inst in stbl.items():
-                outpkg.put(rid, inst.binary)
+                outpkg.put(rid, lambda table=inst: table.binary)
                 progress_signals.increment.emit()
 
         progress_signals.finished.emit()
@@ -331,7 +424,7 @@ class PackagesStorage:
                 fpath = create_temporary_copy(fpath)
                 is_temp = True
 
-            dbfile = DbpfPackage(fpath, mode='r')
+            dbfile = DbpfPackage(fpath, mode='r', memory_map=True)
             outpkg = DbpfPackage(tpath, mode='w')
 
             instances = dbfile.search()
@@ -340,21 +433,8 @@ class PackagesStorage:
                 interface.text('System', 'Saving package {}...').format(os.path.basename(tpath)),
                 len(instances))
 
-            language_dest = config.value('translation', 'destination')
-
-            for rid in instances:
-                if rid.language == language_dest:
-                    for r, s in stbl.items():
-                        if r.group == rid.group and r.instance == rid.instance:
-                            outpkg.put(r, s.binary)
-                            del stbl[r]
-                            break
-                else:
-                    content = dbfile[rid].content
-                    if content:
-                        outpkg.put(rid, content)
-
-                progress_signals.increment.emit()
+            merge_stbl(dbfile, outpkg, instances, stbl, config.value('translation', 'destination'),
+                       progress_signals.increment.emit)
 
             dbfile.close()
 
@@ -373,6 +453,8 @@ class PackagesStorage:
         if not self.packages:
             return
 
+        self.proxy.stop()
+
         package_key = app_state.current_package
 
         if package_key and len(self.packages) > 1:
@@ -389,7 +471,12 @@ class PackagesStorage:
                 else:
                     item.clear()
 
+            self.records = self.records.compact(items)
+            self.__by_package.clear()
+            self.__by_instance.clear()
+            self.__index(items)
             self.model.replace(items)
+            self.__build_index()
 
             self.packages = [p for p in self.packages if p.key != package_key]
 
@@ -397,7 +484,14 @@ class PackagesStorage:
 
         else:
             undo.clean()
+            self.__unresolved.clear()
             self.model.clear()
+            self.records = RecordStore()
+            self.__by_package.clear()
+            self.__by_instance.clear()
+            if self.search_index is not None:
+                self.search_index.cancel()
+                self.search_index = None
             self.packages.clear()
             self.signals.cleared.emit()
 
@@ -411,7 +505,7 @@ class PackagesStorage:
         if not os.path.exists(path):
             return False
 
-        with DbpfPackage.read(path) as dbfile:
+        with DbpfPackage.read(path, memory_map=True) as dbfile:
             stbl = dbfile.search_stbl()
             return len(stbl) > 0
 
@@ -485,7 +579,7 @@ class PackagesStorage:
 
         language_dest = config.value('translation', 'destination')
 
-        with DbpfPackage.read(path) as dbfile:
+        with DbpfPackage.read(path, memory_map=True) as dbfile:
             for rid in dbfile.search_stbl():
                 if rid.language == language_dest:
                     stbl = Stbl(rid=rid, value=dbfile[rid].content)
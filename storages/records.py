@@ -1,117 +1,323 @@
 # -*- coding: utf-8 -*-
 
+from array import array
+
 from packer.resource import ResourceID
 from utils.functions import compare
 from utils.constants import *
 
 
-class AbstractRecord(list):
-
-    def __init__(self, *args):
-        super().__init__(args)
-
-
-class MainRecord(AbstractRecord):
+class RecordStore:
+
+    def __init__(self) -> None:
+        self.idx = array('I')
+        self.id = array('I')
+        self.instance = array('Q')
+        self.group = array('I')
+        self.flag = array('b')
+        self.index_alt = array('I')
+
+        self.source = []
+        self.translate = []
+        self.comment = []
+
+        # rarely set, so only the rows that have a value are kept
+        self.source_old = {}
+        self.translate_old = {}
+
+        # (row revision, lowercased text) for searching, filled on first use by the filter workers,
+        # a value cached from text replaced meanwhile carries an old revision and is lowercased again
+        self.source_lower = []
+        self.translate_lower = []
+
+        # rows whose translation was set, only collected while a search index needs them
+        self.changed = None
+
+        # per row edit counters, used to invalidate cached display text
+        self.revisions = array('I')
+
+        self.revision = 0
+
+        self.resource = array('I')
+        self.resource_original = array('I')
+        self.package = array('I')
+
+        self.resources = []
+        self.packages = []
+
+        self.__resources = {}
+        self.__packages = {}
+
+        self.__getters = {
+            RECORD_MAIN_INDEX: self.idx.__getitem__,
+            RECORD_MAIN_ID: self.id.__getitem__,
+            RECORD_MAIN_INSTANCE: self.instance.__getitem__,
+            RECORD_MAIN_GROUP: self.group.__getitem__,
+            RECORD_MAIN_SOURCE: self.source.__getitem__,
+            RECORD_MAIN_TRANSLATE: self.translate.__getitem__,
+            RECORD_MAIN_FLAG: self.flag.__getitem__,
+            RECORD_MAIN_RESOURCE: lambda row: self.resources[self.resource[row]],
+            RECORD_MAIN_RESOURCE_ORIGINAL: lambda row: self.resources[self.resource_original[row]],
+            RECORD_MAIN_PACKAGE: lambda row: self.packages[self.package[row]],
+            RECORD_MAIN_SOURCE_OLD: self.source_old.get,
+            RECORD_MAIN_TRANSLATE_OLD: self.translate_old.get,
+            RECORD_MAIN_INDEX_ALT: lambda row: tuple(self.index_alt[row * 4:row * 4 + 4]),
+            RECORD_MAIN_COMMENT: self.comment.__getitem__,
+        }
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def intern_resource(self, rid: ResourceID) -> int:
+        ref = self.__resources.get(rid)
+        if ref is None:
+            ref = self.__resources[rid] = len(self.resources)
+            self.resources.append(rid)
+        return ref
+
+    def intern_package(self, key: str) -> int:
+        ref = self.__packages.get(key)
+        if ref is None:
+            ref = self.__packages[key] = len(self.packages)
+            self.packages.append(key)
+        return ref
+
+    def append(self, idx, sid, instance, group, source, translate, flag, resource, resource_original, package,
+               source_old, translate_old, index_alt, comment) -> 'MainRecord':
+        row = len(self.id)
+
+        self.idx.append(idx)
+        self.id.append(sid)
+        self.instance.append(instance)
+        self.group.append(group)
+        self.source.append(source)
+        self.translate.append(translate)
+        self.flag.append(flag)
+        self.resource.append(self.intern_resource(resource))
+        self.resource_original.append(self.intern_resource(resource_original))
+        self.package.append(self.intern_package(package))
+        self.index_alt.extend(tuple(index_alt) if index_alt else (0, 0, 0, 0))
+        self.comment.append(comment)
+
+        self.source_lower.append(None)
+        self.translate_lower.append(None)
+
+        self.revisions.append(0)
+        self.revision += 1
+
+        if source_old is not None:
+            self.source_old[row] = source_old
+        if translate_old is not None:
+            self.translate_old[row] = translate_old
+
+        return MainRecord(self, row)
+
+    def get(self, row: int, index: int):
+        try:
+            getter = self.__getters[index]
+        except KeyError:
+            raise IndexError(index)
+        return getter(row)
+
+    def lower(self, row: int, index: int) -> str:
+        column = self.source_lower if index == RECORD_MAIN_SOURCE else self.translate_lower
+        revision = self.revisions[row]
+        cached = column[row]
+        if cached is not None and cached[0] == revision:
+            return cached[1]
+        # the revision is read before the text, set() bumps it only after the text is replaced
+        value = self.get(row, index).lower()
+        column[row] = (revision, value)
+        return value
+
+    def set(self, row: int, index: int, value) -> None:
+        self.__set(row, index, value)
+
+        self.revisions[row] += 1
+        self.revision += 1
+
+    def __set(self, row: int, index: int, value) -> None:
+        if index == RECORD_MAIN_INDEX:
+            self.idx[row] = value
+        elif index == RECORD_MAIN_ID:
+            self.id[row] = value
+        elif index == RECORD_MAIN_INSTANCE:
+            self.instance[row] = value
+        elif index == RECORD_MAIN_GROUP:
+            self.group[row] = value
+        elif index == RECORD_MAIN_SOURCE:
+            self.source[row] = value
+        elif index == RECORD_MAIN_TRANSLATE:
+            self.translate[row] = value
+            if self.changed is not None:
+                self.changed.add(row)
+        elif index == RECORD_MAIN_FLAG:
+            self.flag[row] = value
+        elif index == RECORD_MAIN_RESOURCE:
+            self.resource[row] = self.intern_resource(value)
+        elif index == RECORD_MAIN_RESOURCE_ORIGINAL:
+            self.resource_original[row] = self.intern_resource(value)
+        elif index == RECORD_MAIN_PACKAGE:
+            self.package[row] = self.intern_package(value)
+        elif index in (RECORD_MAIN_SOURCE_OLD, RECORD_MAIN_TRANSLATE_OLD):
+            column = self.source_old if index == RECORD_MAIN_SOURCE_OLD else self.translate_old
+            if value is None:
+                column.pop(row, None)
+            else:
+                column[row] = value
+        elif index == RECORD_MAIN_INDEX_ALT:
+            self.index_alt[row * 4:row * 4 + 4] = array('I', value)
+        elif index == RECORD_MAIN_COMMENT:
+            self.comment[row] = value
+        else:
+            raise IndexError(index)
+
+    def values(self, row: int) -> tuple:
+        return tuple(self.__getters[i](row) for i in range(len(self.__getters)))
+
+    def compact(self, records: list) -> 'RecordStore':
+        store = RecordStore()
+        for record in records:
+            moved = store.append(*self.values(record.row))
+            record.store = store
+            record.row = moved.row
+        return store
+
+
+class MainRecord:
+
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store: RecordStore, row: int) -> None:
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, index: int):
+        return self.store.get(self.row, index)
+
+    def __setitem__(self, index: int, value) -> None:
+        self.store.set(self.row, index, value)
+
+    def __len__(self) -> int:
+        return RECORD_MAIN_COMMENT + 1
+
+    def __iter__(self):
+        return iter(self.store.values(self.row))
+
+    def clear(self) -> None:
+        self.store = None
 
     @property
     def idx(self) -> int:
-        return self[RECORD_MAIN_INDEX]
+        return self.store.idx[self.row]
 
     @idx.setter
     def idx(self, value: int) -> None:
-        self[RECORD_MAIN_INDEX] = value
+        self.store.set(self.row, RECORD_MAIN_INDEX, value)
 
     @property
     def idx_standart(self) -> int:
-        return self[RECORD_MAIN_INDEX_ALT][0]
+        return self.store.index_alt[self.row * 4]
 
     @property
     def idx_source(self) -> int:
-        return self[RECORD_MAIN_INDEX_ALT][1]
+        return self.store.index_alt[self.row * 4 + 1]
 
     @property
     def idx_dp(self) -> int:
-        return self[RECORD_MAIN_INDEX_ALT][1]
+        return self.store.index_alt[self.row * 4 + 1]
+
+    @property
+    def revision(self) -> int:
+        return self.store.revisions[self.row]
 
     @property
     def id(self) -> int:
-        return self[RECORD_MAIN_ID]
+        return self.store.id[self.row]
 
     @property
     def id_hex(self) -> str:
-        return '0x{sid:08X}'.format(sid=self[RECORD_MAIN_ID])
+        return '0x{sid:08X}'.format(sid=self.store.id[self.row])
 
     @property
     def instance(self) -> int:
-        return self[RECORD_MAIN_INSTANCE]
+        return self.store.instance[self.row]
 
     @property
     def instance_hex(self) -> str:
-        return '0x{instance:016X}'.format(instance=self[RECORD_MAIN_INSTANCE])
+        return '0x{instance:016X}'.format(instance=self.store.instance[self.row])
 
     @property
     def group(self) -> int:
-        return self[RECORD_MAIN_GROUP]
+        return self.store.group[self.row]
 
     @property
     def group_hex(self) -> str:
-        return '0x{group:08X}'.format(group=self[RECORD_MAIN_GROUP])
+        return '0x{group:08X}'.format(group=self.store.group[self.row])
 
     @property
     def source(self) -> str:
-        return self[RECORD_MAIN_SOURCE]
+        return self.store.source[self.row]
+
+    @property
+    def source_lower(self) -> str:
+        return self.store.lower(self.row, RECORD_MAIN_SOURCE)
 
     @property
     def source_old(self) -> str:
-        return self[RECORD_MAIN_SOURCE_OLD]
+        return self.store.source_old.get(self.row)
 
     @source_old.setter
     def source_old(self, value: str) -> None:
-        self[RECORD_MAIN_SOURCE_OLD] = value
+        self.store.set(self.row, RECORD_MAIN_SOURCE_OLD, value)
 
     @property
     def translate(self) -> str:
-        return self[RECORD_MAIN_TRANSLATE]
+        return self.store.translate[self.row]
 
     @translate.setter
     def translate(self, value: str) -> None:
-        self[RECORD_MAIN_TRANSLATE] = value
+        self.store.set(self.row, RECORD_MAIN_TRANSLATE, value)
+
+    @property
+    def translate_lower(self) -> str:
+        return self.store.lower(self.row, RECORD_MAIN_TRANSLATE)
 
     @property
     def translate_old(self) -> str:
-        return self[RECORD_MAIN_TRANSLATE_OLD]
+        return self.store.translate_old.get(self.row)
 
     @translate_old.setter
     def translate_old(self, value: str) -> None:
-        self[RECORD_MAIN_TRANSLATE_OLD] = value
+        self.store.set(self.row, RECORD_MAIN_TRANSLATE_OLD, value)
 
     @property
     def flag(self) -> int:
-        return self[RECORD_MAIN_FLAG]
+        return self.store.flag[self.row]
 
     @flag.setter
     def flag(self, value: int) -> None:
-        self[RECORD_MAIN_FLAG] = value
+        self.store.set(self.row, RECORD_MAIN_FLAG, value)
 
     @property
     def resource(self) -> ResourceID:
-        return self[RECORD_MAIN_RESOURCE]
+        return self.store.resources[self.store.resource[self.row]]
 
     @property
     def resource_original(self) -> ResourceID:
-        return self[RECORD_MAIN_RESOURCE_ORIGINAL]
+        return self.store.resources[self.store.resource_original[self.row]]
 
     @property
     def package(self) -> str:
-        return self[RECORD_MAIN_PACKAGE]
+        return self.store.packages[self.store.package[self.row]]
 
     @property
     def comment(self) -> str:
-        return self[RECORD_MAIN_COMMENT]
+        return self.store.comment[self.row]
 
     @comment.setter
     def comment(self, value: str) -> None:
-        self[RECORD_MAIN_COMMENT] = value
+        self.store.set(self.row, RECORD_MAIN_COMMENT, value)
 
     def compare(self) -> bool:
-        return compare(self[RECORD_MAIN_SOURCE], self[RECORD_MAIN_TRANSLATE])
+        return compare(self.store.source[self.row], self.store.translate[self.row])
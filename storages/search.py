@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+from bisect import bisect_left
+from PySide6.QtCore import QRunnable
+from typing import Union
+
+from .records import RecordStore
+
+from utils.constants import *
+
+
+NGRAM = 3
+
+
+def ngrams(text: str) -> set:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+def contains(rows: array, row: int) -> bool:
+    i = bisect_left(rows, row)
+    return i < len(rows) and rows[i] == row
+
+
+class SearchIndex:
+
+    def __init__(self, records: RecordStore) -> None:
+        self.records = records
+        self.records.changed = set()
+
+        self.ready = False
+
+        # trigram -> ascending store rows
+        self.__source = {}
+        self.__translate = {}
+
+        # trigram -> rows for translations changed after indexing
+        self.__changed = {}
+
+        self.__indexed = 0
+        self.__cancelled = False
+
+    def cancel(self) -> None:
+        self.__cancelled = True
+
+    def build(self) -> None:
+        self.ready = False
+
+        records = self.records
+        count = len(records)
+
+        for row in range(self.__indexed, count):
+            if self.__cancelled:
+                return
+            self.__add(self.__source, row, records.lower(row, RECORD_MAIN_SOURCE))
+            self.__add(self.__translate, row, records.lower(row, RECORD_MAIN_TRANSLATE))
+
+        self.__indexed = count
+        self.ready = True
+
+    @staticmethod
+    def __add(index: dict, row: int, text: str) -> None:
+        for gram in ngrams(text):
+            rows = index.get(gram)
+            if rows is None:
+                rows = index[gram] = array('I')
+            rows.append(row)
+
+    def __update(self) -> None:
+        changed = self.records.changed
+        while changed:
+            row = changed.pop()
+            for gram in ngrams(self.records.lower(row, RECORD_MAIN_TRANSLATE)):
+                self.__changed.setdefault(gram, set()).add(row)
+
+    def search(self, text: str, mode: int) -> Union[set, None]:
+        if not self.ready or self.__indexed != len(self.records) or len(text) < NGRAM:
+            return None
+
+        if mode == SEARCH_IN_SOURCE:
+            return self.__lookup(self.__source, text)
+
+        elif mode == SEARCH_IN_DESTINATION:
+            self.__update()
+            rows = self.__lookup(self.__translate, text)
+            grams = [self.__changed.get(gram) for gram in ngrams(text)]
+            if all(grams):
+                rows |= set.intersection(*grams)
+            return rows
+
+        return None
+
+    @staticmethod
+    def __lookup(index: dict, text: str) -> set:
+        postings = []
+        for gram in ngrams(text):
+            rows = index.get(gram)
+            if not rows:
+                return set()
+            postings.append(rows)
+
+        postings.sort(key=len)
+
+        candidates = set(postings[0])
+        for rows in postings[1:]:
+            # the caller verifies every candidate, so stop once few are left
+            if len(candidates) < 64:
+                break
+            candidates = {row for row in candidates if contains(rows, row)}
+
+        return candidates
+
+
+class IndexWorker(QRunnable):
+
+    def __init__(self, index: SearchIndex):
+        super().__init__()
+
+        self.index = index
+
+    def run(self):
+        self.index.build()
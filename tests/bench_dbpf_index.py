@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# entries/sec of the dbpf index readers for every flags layout: python tests/bench_dbpf_index.py [count] [large]
+
+import os
+import sys
+import time
+import struct
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from packer.dbpf import _DbpfReader, _CONST_TYPE, _CONST_GROUP, _CONST_INSTANCE_EX
+
+
+def package(flags, count):
+    # header and index only, the readers never touch the payloads
+    rng = random.Random(flags)
+    consts = [(flag, rng.getrandbits(32)) for flag in (_CONST_TYPE, _CONST_GROUP, _CONST_INSTANCE_EX)]
+
+    index = bytearray(struct.pack('<I', flags))
+    for flag, value in consts:
+        if flags & flag:
+            index += struct.pack('<I', value)
+
+    for _ in range(count):
+        for flag, _ in consts:
+            if not flags & flag:
+                index += struct.pack('<I', rng.getrandbits(32))
+        size = rng.randrange(1, 1 << 20)
+        index += struct.pack('<4I2H', rng.getrandbits(32), rng.getrandbits(31), size | 0x80000000,
+                             size * 2, 0x5A42, 1)
+
+    header = struct.pack('<4s11I16xI24x', b'DBPF', 2, 1, 0, 0, 0, 0, 0, 0, count, 0, len(index), 96)
+    return header.ljust(96, b'\0') + bytes(index)
+
+
+def measure(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(path, count, memory_map):
+    with open(path, 'rb') as fp:
+        reader = _DbpfReader(fp, memory_map=memory_map)
+        try:
+            if reader.decode_index() != list(reader.iter_index()):
+                raise Exception('Index readers differ: {}'.format(path))
+
+            sequential = measure(lambda: list(reader.iter_index()))
+            decoded = measure(lambda: reader.decode_index())
+        finally:
+            reader.close()
+
+    return count / sequential, count / decoded
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    large = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+
+    layouts = [(flags, count) for flags in range(8)] + [(_CONST_TYPE | _CONST_GROUP, large)]
+
+    print('{:>5} {:>8} {:>4} {:>16} {:>16} {:>8}'.format('flags', 'entries', 'mmap', 'iter_index/sec',
+                                                     'decode_index/sec', 'speedup'))
+
+    with tempfile.TemporaryDirectory() as directory:
+        for flags, entries in layouts:
+            path = os.path.join(directory, '{}-{}.package'.format(flags, entries))
+            with open(path, 'wb') as fp:
+                fp.write(package(flags, entries))
+
+            for memory_map in (False, True):
+                sequential, decoded = run(path, entries, memory_map)
+                print('{:>5} {:>8} {:>4} {:>16,.0f} {:>16,.0f} {:>7.1f}x'.format(
+                    flags, entries, 'yes' if memory_map else 'no', sequential, decoded, decoded / sequential))
+
+
+if __name__ == '__main__':
+    main()
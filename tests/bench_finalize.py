@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+# merge of the edited stbls into a package with every table in 18 locales: python tests/bench_finalize.py [instances]
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from packer.dbpf import DbpfPackage
+from packer.resource import ResourceID
+from packer.stbl import Stbl
+
+from singletons.languages import languages
+from storages.packages import merge_stbl
+
+
+LOCALES = ['ENG_US', 'CHS_CN', 'CHT_CN', 'CZE_CZ', 'DAN_DK', 'DUT_NL', 'FIN_FI', 'FRE_FR', 'GER_DE',
+           'ITA_IT', 'JPN_JP', 'KOR_KR', 'NOR_NO', 'POL_PL', 'POR_BR', 'RUS_RU', 'SPA_ES', 'SWE_SE']
+
+DESTINATION = 'RUS_RU'
+
+
+class NullPackage:
+
+    def put(self, rid, content):
+        pass
+
+    def copy(self, resource):
+        pass
+
+
+def scan_stbl(dbfile, outpkg, instances, stbl, language):
+    # the lookup finalize used before, a scan of the pending tables for every destination table
+    for rid in instances:
+        if rid.language == language:
+            for r, s in stbl.items():
+                if r.group == rid.group and r.instance == rid.instance:
+                    outpkg.put(r, s.binary)
+                    del stbl[r]
+                    break
+        else:
+            resource = dbfile[rid]
+            if resource.size:
+                outpkg.copy(resource)
+
+
+def table(rid, rng, count=5):
+    stbl = Stbl(rid)
+    for _ in range(count):
+        stbl.add(rng.getrandbits(32), 'String {}'.format(rng.getrandbits(16)))
+    return stbl
+
+
+def measure(function, prepare, repeat=3):
+    best = None
+    for _ in range(repeat):
+        args = prepare()
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    rng = random.Random(0)
+
+    bases = [rng.getrandbits(56) for _ in range(count)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'strings.package')
+
+        with DbpfPackage.write(path) as out:
+            for locale in LOCALES:
+                language = languages.by_locale(locale).id
+                for base in bases:
+                    rid = ResourceID(group=0x80000000, instance=language << 56 | base, type=0x220557DA)
+                    out.put(rid, table(rid, rng).binary)
+
+        # edited tables are collected in load order, the worst case for the scan is the reverse of the package
+        destination = languages.by_locale(DESTINATION).id
+        edited = {}
+        for base in reversed(bases):
+            rid = ResourceID(group=0x80000000, instance=destination << 56 | base, type=0x220557DA)
+            edited[rid] = table(rid, rng)
+
+        with DbpfPackage.read(path, memory_map=True) as dbfile:
+            instances = dbfile.search()
+
+            def prepare():
+                return dbfile, NullPackage(), instances, dict(edited), DESTINATION
+
+            scan = measure(scan_stbl, prepare)
+            merge = measure(merge_stbl, prepare)
+
+            def prepare_write():
+                return dbfile, DbpfPackage(os.path.join(directory, 'out.package'), mode='w'), instances, \
+                    dict(edited), DESTINATION
+
+            def write(dbfile, outpkg, instances, stbl, language):
+                merge_stbl(dbfile, outpkg, instances, stbl, language)
+                outpkg.commit()
+
+            finalize = measure(write, prepare_write, repeat=1)
+
+    print('tables: {} instances x {} locales, {} edited'.format(count, len(LOCALES), len(edited)))
+    print('scan:     {:>8.3f}s'.format(scan))
+    print('merge:    {:>8.3f}s ({:.0f}x)'.format(merge, scan / merge))
+    print('finalize: {:>8.3f}s, merge and write of the package'.format(finalize))
+
+
+if __name__ == '__main__':
+    main()
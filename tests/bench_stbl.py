@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+# strings/sec of the stbl parser and serializer: python tests/bench_stbl.py [count]
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from packer.resource import ResourceID
+from packer.stbl import Stbl
+
+
+def sample(count):
+    rng = random.Random(0)
+    words = ['Sim', 'house', 'the', 'and', 'Plumbob', 'career', 'lot', '{0.SimFirstName}', 'Привет', '\\n']
+    return {rng.getrandbits(32): ' '.join(rng.choice(words) for _ in range(rng.randrange(1, 30)))
+            for _ in range(count)}
+
+
+def measure(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rid = ResourceID(group=0x80000000, instance=0, type=0x220557DA)
+
+    strings = sample(count)
+
+    stbl = Stbl(rid=rid)
+    for key, value in strings.items():
+        stbl.add(key, value)
+
+    data = stbl.binary
+    count = len(strings)
+
+    serialize = measure(lambda: stbl.binary)
+    parse = measure(lambda: Stbl(rid=rid, value=data).strings)
+
+    print('strings: {}, {} bytes'.format(count, len(data)))
+    print('parse:     {:>12,.0f} strings/sec'.format(count / parse))
+    print('serialize: {:>12,.0f} strings/sec'.format(count / serialize))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+
+
+# the singletons read and write ./prefs relative to the working directory, the tests run from a copy
+# of the shipped prefs so the config written on import does not land in the repository
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_directory = tempfile.mkdtemp(prefix='sims4-translator-')
+
+
+def pytest_sessionstart(session):
+    shutil.copytree(os.path.join(_root, 'prefs'), os.path.join(_directory, 'prefs'),
+                    ignore=shutil.ignore_patterns('config.xml'))
+    os.chdir(_directory)
+
+
+def pytest_unconfigure(config):
+    os.chdir(_root)
+    shutil.rmtree(_directory, ignore_errors=True)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+# decode_ref_pack as it was before the slice copying decoder, kept as the reference
+
+
+def decode_ref_pack(ibuf):
+    if ibuf[1] != 0xFB:
+        raise Exception('Invalid compressed data')
+
+    iptr = 2
+    optr = 0
+    flags = ibuf[0]
+    osize = 0
+
+    for _ in range(4 if flags & 0x80 else 3):
+        osize = (osize << 8) | ibuf[iptr]
+        iptr += 1
+
+    obuf = bytearray(osize)
+    while iptr < len(ibuf):
+        copy_offset = 0
+        cc0 = ibuf[iptr]
+        iptr += 1
+        if cc0 <= 0x7F:
+            cc1 = ibuf[iptr]
+            iptr += 1
+            _cc = (cc0, cc1)
+            num_plaintext = cc0 & 0x03
+            num_to_copy = ((cc0 & 0x1C) >> 2) + 3
+            copy_offset = ((cc0 & 0x60) << 3) + cc1
+        elif cc0 <= 0xBF:
+            cc1 = ibuf[iptr]
+            iptr += 1
+            cc2 = ibuf[iptr]
+            iptr += 1
+            _cc = (cc0, cc1, cc2)
+            num_plaintext = (cc1 & 0xC0) >> 6
+            num_to_copy = (cc0 & 0x3F) + 4
+            copy_offset = ((cc1 & 0x3F) << 8) + cc2
+        elif cc0 <= 0xDF:
+            cc1 = ibuf[iptr]
+            iptr += 1
+            cc2 = ibuf[iptr]
+            iptr += 1
+            cc3 = ibuf[iptr]
+            iptr += 1
+            _cc = (cc0, cc1, cc2, cc3)
+            num_plaintext = cc0 & 0x03
+            num_to_copy = ((cc0 & 0x0C) << 6) + cc3 + 5
+            copy_offset = ((cc0 & 0x10) << 12) + (cc1 << 8) + cc2
+        elif cc0 <= 0xFB:
+            _cc = (cc0,)
+            num_plaintext = ((cc0 & 0x1F) << 2) + 4
+            num_to_copy = 0
+        else:
+            _cc = (cc0,)
+            num_plaintext = cc0 & 3
+            num_to_copy = 0
+
+        obuf[optr:optr + num_plaintext] = ibuf[iptr:iptr + num_plaintext]
+        iptr += num_plaintext
+        optr += num_plaintext
+
+        for _ in range(num_to_copy):
+            obuf[optr] = obuf[optr - 1 - copy_offset]
+            optr += 1
+
+    return bytes(obuf)
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+from packer.dbpf import (DbpfPackage, decode_ref_pack, encode_ref_pack,
+                         COMPRESSION_NONE, COMPRESSION_REFPACK, COMPRESSION_ZLIB)
+from packer.resource import ResourceID
+
+from refpack_baseline import decode_ref_pack as decode_ref_pack_baseline
+
+
+def noise(seed, size):
+    rng = random.Random(seed)
+    return bytes(rng.getrandbits(8) for _ in range(size))
+
+
+def text(seed, words):
+    rng = random.Random(seed)
+    vocabulary = [b'Sim', b'house', b'the', b'and', b'Plumbob', b'career', b'lot', b'{0.SimFirstName}', b'\\n']
+    return b' '.join(rng.choice(vocabulary) for _ in range(words))
+
+
+SAMPLES = {
+    'empty': b'',
+    'one': b'a',
+    'three': b'abc',
+    'four': b'abcd',
+    'five': b'abcde',
+    'run': b'a' * 5000,
+    'period': b'ab' * 3000,
+    'long_plaintext': noise(1, 1000),
+    'repeated_noise': noise(2, 3000) * 3,
+    'far_match': noise(3, 0x1FFFF) + noise(3, 64),
+    'too_far_match': noise(4, 0x20001) + noise(4, 64),
+    'text': text(5, 6000),
+    'utf8': 'Привет, мир! 你好，世界！'.encode('utf-8') * 200,
+}
+
+
+@pytest.mark.parametrize('data', SAMPLES.values(), ids=SAMPLES.keys())
+def test_ref_pack_round_trip(data):
+    encoded = encode_ref_pack(data)
+    assert decode_ref_pack(encoded) == data
+    assert decode_ref_pack_baseline(encoded) == data
+
+
+def test_ref_pack_compresses():
+    data = SAMPLES['text']
+    assert len(encode_ref_pack(data)) < len(data) // 2
+    assert len(encode_ref_pack(SAMPLES['run'])) < 100
+
+
+def test_ref_pack_accepts_views():
+    data = SAMPLES['text']
+    assert decode_ref_pack(encode_ref_pack(memoryview(data))) == data
+    assert decode_ref_pack(encode_ref_pack(bytearray(data))) == data
+
+
+def resources():
+    return {ResourceID(group=0x80000000, instance=i, type=0x220557DA): data
+            for i, data in enumerate(SAMPLES.values())}
+
+
+@pytest.mark.parametrize('compression', [COMPRESSION_NONE, COMPRESSION_REFPACK, COMPRESSION_ZLIB])
+@pytest.mark.parametrize('workers', [0, None])
+@pytest.mark.parametrize('memory_map', [False, True])
+def test_package_round_trip(tmp_path, compression, workers, memory_map):
+    filename = str(tmp_path / 'test.package')
+    expected = resources()
+
+    with DbpfPackage.write(filename, workers=workers) as dbfile:
+        for rid, data in expected.items():
+            dbfile.put(rid, data, compression)
+
+    with DbpfPackage.read(filename, memory_map=memory_map) as dbfile:
+        assert list(dbfile.search()) == list(expected)
+        for rid, data in expected.items():
+            resource = dbfile[rid]
+            assert resource.size == len(data)
+            assert resource.locator.compression[0] == compression
+            assert resource.content == data
+
+
+@pytest.mark.parametrize('compression', [COMPRESSION_NONE, COMPRESSION_REFPACK, COMPRESSION_ZLIB])
+def test_package_copy(tmp_path, compression):
+    source = str(tmp_path / 'source.package')
+    target = str(tmp_path / 'target.package')
+    expected = resources()
+
+    with DbpfPackage.write(source) as dbfile:
+        for rid, data in expected.items():
+            dbfile.put(rid, data, compression)
+
+    with DbpfPackage.read(source, memory_map=True) as original:
+        with DbpfPackage.write(target) as dbfile:
+            for rid in original.search():
+                dbfile.copy(original[rid])
+
+        with DbpfPackage.read(target) as dbfile:
+            for rid, data in expected.items():
+                assert dbfile[rid].locator.compression == original[rid].locator.compression
+                assert dbfile.raw(dbfile[rid]) == bytes(original.raw(original[rid]))
+                assert dbfile[rid].content == data
+
+
+def test_package_empty(tmp_path):
+    filename = str(tmp_path / 'empty.package')
+
+    with DbpfPackage.write(filename):
+        pass
+
+    with DbpfPackage.read(filename) as dbfile:
+        assert not dbfile.search()
+        assert dbfile[ResourceID(group=0, instance=0, type=0x220557DA)] is None
+
+
+def test_package_read_keeps_error_with_raw_view(tmp_path):
+    filename = str(tmp_path / 'test.package')
+    rid = ResourceID(group=0, instance=1, type=0x220557DA)
+
+    with DbpfPackage.write(filename) as dbfile:
+        dbfile.put(rid, SAMPLES['text'], COMPRESSION_NONE)
+
+    with pytest.raises(ValueError):
+        with DbpfPackage.read(filename, memory_map=True) as dbfile:
+            raw = dbfile.raw(dbfile[rid])
+            raise ValueError('decode failed')
+
+    raw.release()
+
+
+def test_package_write_is_not_readable(tmp_path):
+    filename = str(tmp_path / 'test.package')
+
+    with DbpfPackage.write(filename) as outpkg:
+        with pytest.raises(Exception):
+            outpkg[ResourceID(group=0, instance=0, type=0x220557DA)]
+        with pytest.raises(Exception):
+            outpkg.search()
+
+
+def test_package_close_with_raw_view(tmp_path):
+    filename = str(tmp_path / 'test.package')
+    rid = ResourceID(group=0, instance=1, type=0x220557DA)
+
+    with DbpfPackage.write(filename) as dbfile:
+        dbfile.put(rid, SAMPLES['text'], COMPRESSION_NONE)
+
+    dbfile = DbpfPackage(filename, memory_map=True)
+    raw = dbfile.raw(dbfile[rid])
+    with pytest.raises(BufferError):
+        dbfile.close()
+
+    raw.release()
+    dbfile.close()
+
+    with DbpfPackage.read(filename, memory_map=True) as dbfile:
+        content = dbfile[rid].content
+
+    assert content == SAMPLES['text']
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+# the record store pulls in the gui helpers
+pytest.importorskip('PySide6')
+
+from packer.resource import ResourceID
+from storages.records import RecordStore
+from utils.constants import *
+
+
+RID = ResourceID(group=0x80000000, instance=0x0012345678ABCDEF, type=0x220557DA)
+
+
+def store(translate):
+    records = RecordStore()
+    records.append(1, 1, RID.instance, RID.group, 'Source', translate, FLAG_UNVALIDATED, RID, RID, 'package',
+                   None, None, None, '')
+    return records
+
+
+def test_lower_follows_set():
+    records = store('First')
+    assert records.lower(0, RECORD_MAIN_TRANSLATE) == 'first'
+    records.set(0, RECORD_MAIN_TRANSLATE, 'Second')
+    assert records.lower(0, RECORD_MAIN_TRANSLATE) == 'second'
+
+
+def test_lower_set_while_lowercasing():
+    records = store('Old')
+    get = records.get
+
+    # the text is replaced between reading it and caching its lowercase
+    def racing(row, index):
+        text = get(row, index)
+        records.get = get
+        records.set(row, RECORD_MAIN_TRANSLATE, 'New')
+        return text
+
+    records.get = racing
+    assert records.lower(0, RECORD_MAIN_TRANSLATE) == 'old'
+    assert records.lower(0, RECORD_MAIN_TRANSLATE) == 'new'
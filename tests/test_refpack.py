@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+import os
+import glob
+
+import pytest
+
+from packer.dbpf import decode_ref_pack
+
+from refpack_baseline import decode_ref_pack as decode_ref_pack_baseline
+
+
+FIXTURES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), 'fixtures', 'refpack', '*.bin')))
+
+
+def read(filename):
+    with open(filename, 'rb') as fp:
+        return fp.read()
+
+
+def test_fixtures_exist():
+    assert FIXTURES
+
+
+@pytest.mark.parametrize('filename', FIXTURES, ids=os.path.basename)
+def test_decode_matches_baseline(filename):
+    data = read(filename)
+    expected = decode_ref_pack_baseline(data)
+    assert decode_ref_pack(data) == expected
+    assert decode_ref_pack(memoryview(data)) == expected
+    assert decode_ref_pack(bytearray(data)) == expected
+
+
+@pytest.mark.parametrize('offset, length', [(0, 3), (0, 1028), (1, 7), (2, 67), (3, 1000), (3, 8)])
+def test_decode_overlapping_copy(offset, length):
+    # four literals, then a copy reaching back into its own output
+    if length <= 10 and offset < 0x400:
+        command = bytes((((offset >> 3) & 0x60) | ((length - 3) << 2), offset & 0xFF))
+    elif length <= 67:
+        command = bytes((0x80 | (length - 4), offset >> 8, offset & 0xFF))
+    else:
+        command = bytes((0xC0 | (((length - 5) >> 8) << 2), offset >> 8, offset & 0xFF, (length - 5) & 0xFF))
+    data = bytes((0x10, 0xFB)) + (4 + length).to_bytes(3, 'big') + b'\xe0abcd' + command + b'\xfc'
+    assert decode_ref_pack(data) == decode_ref_pack_baseline(data)
+
+
+def test_decode_invalid():
+    with pytest.raises(Exception):
+        decode_ref_pack(b'\x10\x00\x00\x00\x00')
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+from packer.resource import ResourceID
+from packer.stbl import Stbl
+
+
+RID = ResourceID(group=0x80000000, instance=0x0012345678ABCDEF, type=0x220557DA)
+
+
+def build(strings):
+    stbl = Stbl(rid=RID)
+    for key, value in strings.items():
+        stbl.add(key, value)
+    return stbl.binary
+
+
+def test_round_trip():
+    strings = {1: 'Hello', 2: '', 3: 'Привет, {0.SimFirstName}!', 0xFFFFFFFF: 'a\\nb'}
+    stbl = Stbl(rid=RID, value=build(strings))
+    assert stbl.strings == strings
+    assert stbl.get(3) == strings[3]
+    assert stbl.get(4) is None
+
+
+def test_truncated():
+    data = build({1: 'Hello', 2: 'Привет', 3: 'World'})
+    for size in range(len(data)):
+        strings = Stbl(rid=RID, value=data[:size]).strings
+        assert set(strings) <= {1, 2, 3}
+        assert Stbl(rid=RID, value=data[:size]).index.keys() == strings.keys()
+
+
+def test_truncated_inside_character():
+    data = build({1: 'Привет'})
+    assert Stbl(rid=RID, value=data[:-1]).strings == {}
+    assert Stbl(rid=RID, value=memoryview(data)[:-1]).get(1) is None
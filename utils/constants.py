@@ -2,7 +2,7 @@
 
 APP_VERSION = '1.4'
 APP_RELEASE_CANDITATE = False
-DICTIONARY_VERSION = 4
+DICTIONARY_VERSION = 5
 
 COLUMN_MAIN_INDEX = 1
 COLUMN_MAIN_ID = 2
@@ -43,6 +43,7 @@ FLAG_PROGRESS = 1
 FLAG_VALIDATED = 2
 FLAG_TRANSLATED = 3
 FLAG_REPLACED = 4
+FLAG_FUZZY = 5
 
 SEARCH_IN_SOURCE = 0
 SEARCH_IN_DESTINATION = 1
@@ -33,7 +33,7 @@ class UpdateWorker(QRunnable):
                 translated_count += 1
             elif flag == FLAG_VALIDATED:
                 validated_count += 1
-            elif flag == FLAG_PROGRESS:
+            elif flag == FLAG_PROGRESS or flag == FLAG_FUZZY:
                 progess_count += 1
             elif flag == FLAG_UNVALIDATED:
                 unvalidated_count += 1
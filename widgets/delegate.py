@@ -27,6 +27,7 @@ class MainDelegatePaint(QStyledItemDelegate):
             FLAG_PROGRESS: [QColor(light.PROGRESS_TABLEVIEW), QColor(light.PROGRESS_TABLEVIEW_ODD)],
             FLAG_VALIDATED: [QColor(light.VALIDATED_TABLEVIEW), QColor(light.VALIDATED_TABLEVIEW_ODD)],
             FLAG_REPLACED: [QColor('#c7ffff'), QColor('#e6ffff')],
+            FLAG_FUZZY: [QColor('#fff0c2'), QColor('#fff6dc')],
             FLAG_TRANSLATED: [QColor(light.TRANSLATED_TABLEVIEW), QColor(light.TRANSLATED_TABLEVIEW_ODD)]
         }
 
@@ -35,6 +36,7 @@ class MainDelegatePaint(QStyledItemDelegate):
             FLAG_PROGRESS: [QColor(dark.PROGRESS_TABLEVIEW), QColor(dark.PROGRESS_TABLEVIEW_ODD)],
             FLAG_VALIDATED: [QColor(dark.VALIDATED_TABLEVIEW), QColor(dark.VALIDATED_TABLEVIEW_ODD)],
             FLAG_REPLACED: [QColor('#c7ffff'), QColor('#e6ffff')],
+            FLAG_FUZZY: [QColor('#5a4f2c'), QColor('#6a5e36')],
             FLAG_TRANSLATED: [QColor(dark.TRANSLATED_TABLEVIEW), QColor(dark.TRANSLATED_TABLEVIEW_ODD)]
         }
 
@@ -63,6 +63,12 @@ class QMainTableView(AbstractTableView):
 
         self.sortByColumn(COLUMN_MAIN_INDEX, Qt.SortOrder.AscendingOrder)
 
+    def paintEvent(self, event):
+        model = self.model()
+        if model is not None:
+            model.sourceModel().prepare()
+        super().paintEvent(event)
+
     def set_model(self):
         self.setModel(app_state.packages_storage.proxy)
         self.setItemDelegate(MainDelegatePaint())
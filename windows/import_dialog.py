@@ -74,11 +74,11 @@ class ImportDialog(QDialog, Ui_ImportDialog):
             return
 
         if self.rb_validated.isChecked():
-            flags = [FLAG_UNVALIDATED, FLAG_PROGRESS, FLAG_REPLACED]
+            flags = [FLAG_UNVALIDATED, FLAG_PROGRESS, FLAG_REPLACED, FLAG_FUZZY]
         elif self.rb_validated_partial.isChecked():
             flags = [FLAG_UNVALIDATED]
         elif self.rb_partial.isChecked():
-            flags = [FLAG_PROGRESS, FLAG_REPLACED]
+            flags = [FLAG_PROGRESS, FLAG_REPLACED, FLAG_FUZZY]
         else:
             flags = []
 
@@ -163,6 +163,8 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.menu_view.removeAction(self.action_insert)
         self.action_insert = None
 
+        self.__translate_pending = False
+
         self.filter_timer = QTimer()
         self.filter_timer.setSingleShot(True)
         self.filter_timer.timeout.connect(self.update_proxy)
@@ -179,6 +181,9 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         app_state.packages_storage.signals.loaded.connect(self.__packages_loaded)
         app_state.packages_storage.signals.closed.connect(self.__packages_closed)
         app_state.packages_storage.signals.cleared.connect(self.__packages_cleared)
+        app_state.packages_storage.signals.updated.connect(self.__packages_updated)
+
+        app_state.dictionaries_storage.signals.updated.connect(self.__dictionaries_updated)
 
         self.retranslate()
 
@@ -361,6 +366,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         if not self.toolbar.filter_validate_1.isChecked():
             flags.append(FLAG_PROGRESS)
             flags.append(FLAG_REPLACED)
+            flags.append(FLAG_FUZZY)
         if not self.toolbar.filter_validate_2.isChecked():
             flags.append(FLAG_VALIDATED)
         if not self.toolbar.filter_validate_3.isChecked():
@@ -421,8 +427,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     @staticmethod
     def load(filename: str, added: bool = False):
         if filename:
-            if not app_state.dictionaries_storage.loaded:
-                app_state.dictionaries_storage.load()
+            app_state.dictionaries_storage.load()
             app_state.packages_storage.load(filename, added)
 
     def open_file(self, added: bool = False):
@@ -475,6 +480,14 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.export_dialog.binary_s4s()
 
     def translate_from_dict(self):
+        if not app_state.dictionaries_storage.available or app_state.dictionaries_storage.indexing:
+            # translated once the dictionaries are loaded, the window is not blocked meanwhile
+            if not self.__translate_pending:
+                self.__translate_pending = True
+                progress_signals.initiate.emit(interface.text('System', 'Loading dictionaries...'), 0)
+            app_state.dictionaries_storage.load()
+            return
+
         for item in app_state.packages_storage.items():
             if item.flag == FLAG_UNVALIDATED:
                 translated = app_state.dictionaries_storage.search(source=item.source)
@@ -482,6 +495,13 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                     undo.wrap(item)
                     item.translate = translated[0]
                     item.flag = FLAG_PROGRESS if len(translated) > 1 else FLAG_TRANSLATED
+                    continue
+
+                similar = app_state.dictionaries_storage.similar(item.source, 1)
+                if similar:
+                    undo.wrap(item)
+                    _, item.source_old, item.translate = similar[0]
+                    item.flag = FLAG_FUZZY
 
         self.colorbar.resfesh()
         self.tableview.refresh()
@@ -591,8 +611,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     def load_bundle():
         filename = open_xml()
         if filename:
-            if not app_state.dictionaries_storage.loaded:
-                app_state.dictionaries_storage.load()
+            app_state.dictionaries_storage.load()
             app_state.packages_storage.load_bundle(filename)
 
     @staticmethod
@@ -877,6 +896,19 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         self.set_state_menu()
 
+    @Slot()
+    def __packages_updated(self):
+        self.colorbar.resfesh()
+        self.tableview.refresh()
+        self.filter_timer.start()
+
+    @Slot()
+    def __dictionaries_updated(self):
+        if self.__translate_pending and not app_state.dictionaries_storage.indexing:
+            self.__translate_pending = False
+            progress_signals.finished.emit()
+            self.translate_from_dict()
+
     @Slot(str)
     def __packages_closed(self, key: str):
         self.toolbar.cb_files.blockSignals(True)
@@ -1,16 +1,15 @@
 # -*- coding: utf-8 -*-
 
-from PySide6.QtCore import Qt, QCoreApplication, QObject, QTimer, QAbstractTableModel, \
+import os
+from concurrent.futures import wait
+from PySide6.QtCore import Qt, QObject, QTimer, QAbstractTableModel, \
     Signal, Slot, QThreadPool, QRunnable
 from PySide6.QtWidgets import QHeaderView, QStyledItemDelegate, QDialog
 from PySide6.QtGui import QColor
 
 from windows.ui.options_dialog import Ui_OptionsDialog
 
-from packer.dbpf import DbpfPackage
-from packer.stbl import Stbl
-
-from storages.records import MainRecord
+from storages.cache import BuildCache
 
 import themes.light as light
 import themes.dark as dark
@@ -21,7 +20,7 @@ from singletons.interface import interface
 from singletons.languages import languages
 from singletons.signals import progress_signals
 from singletons.state import app_state
-from utils.functions import opendir
+from utils.functions import opendir, text_to_stbl
 from utils.constants import *
 
 
@@ -41,39 +40,42 @@ class DictWorker(QRunnable):
         self.signals = DictSignals()
 
     def run(self):
-        file_source = self.expansion.file_source
-        file_dest = self.expansion.file_dest
+        # the progress waits for every worker, so finished is emitted whatever happens
+        try:
+            storage = app_state.dictionaries_storage
+
+            name = self.expansion.dictionary
+            path = os.path.join(storage.directory, name + '.dct')
 
-        _strings = {}
+            cache = BuildCache(os.path.join(storage.directory, 'cache', name + '.cache'))
 
-        items = []
+            language_source = config.value('translation', 'source')
+            language_dest = config.value('translation', 'destination')
 
-        language_source = config.value('translation', 'source')
-        language_dest = config.value('translation', 'destination')
+            source_changed = cache.refresh('source', self.expansion.file_source, language_source)
+            dest_changed = cache.refresh('dest', self.expansion.file_dest, language_dest)
 
-        with DbpfPackage.read(file_source) as dbfile:
-            for rid in dbfile.search_stbl():
-                if rid.language == language_source:
-                    stbl = Stbl(rid=rid, value=dbfile[rid].content)
-                    for sid, value in stbl.strings.items():
-                        QCoreApplication.processEvents()
-                        if value:
-                            _strings[sid] = value
+            if source_changed or dest_changed or not cache.built(path):
+                _strings = {}
+                for strings in cache.strings('source'):
+                    _strings.update(strings)
 
-        with DbpfPackage.read(file_dest) as dbfile:
-            for rid in dbfile.search_stbl():
-                if rid.language == language_dest:
-                    stbl = Stbl(rid=rid, value=dbfile[rid].content)
-                    for sid, value in stbl.strings.items():
-                        QCoreApplication.processEvents()
-                        if sid in _strings and _strings[sid] and value:
-                            items.append(
-                                MainRecord(0, sid, 0, 0, _strings[sid], value, FLAG_TRANSLATED, rid, rid, None, None,
-                                           None, [], ''))
+                items = []
+                for strings in cache.strings('dest'):
+                    for sid, value in strings:
+                        if _strings.get(sid):
+                            items.append([sid, text_to_stbl(_strings[sid]), text_to_stbl(value), ''])
 
-        app_state.dictionaries_storage.save_standalone(self.expansion.dictionary, items)
+                # written after a running load, the worker waits for it so the cache sees the new file
+                if storage.ready is not None:
+                    wait([storage.ready])
 
-        self.signals.finished.emit()
+                storage.save_items(name, items)
+                cache.update(path)
+
+            cache.save()
+        finally:
+            self.signals.finished.emit()
 
 
 class Model(QAbstractTableModel):
@@ -168,6 +170,13 @@ class OptionsDialog(QDialog, Ui_OptionsDialog):
         self.cb_backup.setChecked(config.value('save', 'backup'))
         self.cb_experemental.setChecked(config.value('save', 'experemental'))
         self.cb_strong.setChecked(config.value('dictionaries', 'strong'))
+        self.cb_database.setChecked(config.value('dictionaries', 'database'))
+
+        # a threshold of 0 turns the fuzzy matches off
+        fuzzy = config.value('dictionaries', 'fuzzy')
+        self.cb_fuzzy.setChecked(bool(fuzzy))
+        self.sb_fuzzy.setValue(fuzzy or 75)
+        self.sb_fuzzy.setEnabled(bool(fuzzy))
 
         for lang in interface.languages:
             self.cb_language.addItem(lang.name, lang.code)
@@ -184,6 +193,9 @@ class OptionsDialog(QDialog, Ui_OptionsDialog):
         self.cb_backup.clicked.connect(self.checkbox_click)
         self.cb_experemental.clicked.connect(self.checkbox_click)
         self.cb_strong.clicked.connect(self.checkbox_click)
+        self.cb_database.clicked.connect(self.checkbox_click)
+        self.cb_fuzzy.clicked.connect(self.fuzzy_change)
+        self.sb_fuzzy.valueChanged.connect(self.fuzzy_change)
 
         self.txt_path.setText(config.value('dictionaries', 'gamepath'))
         self.txt_deepl_key.setText(config.value('api', 'deepl_key'))
@@ -237,6 +249,9 @@ class OptionsDialog(QDialog, Ui_OptionsDialog):
         self.cb_strong.setText(interface.text('OptionsDialog',
                                               'Do not use automatic translation from other dictionaries'))
         self.gb_path.setTitle(interface.text('OptionsDialog', 'Game path'))
+        self.gb_dictionaries.setTitle(interface.text('OptionsDialog', 'Dictionaries'))
+        self.cb_database.setText(interface.text('OptionsDialog', 'Keep dictionaries in a database'))
+        self.cb_fuzzy.setText(interface.text('OptionsDialog', 'Translate similar strings, minimum similarity'))
         self.gb_lang.setTitle(interface.text('OptionsDialog', 'Languages'))
         self.label_source.setText(interface.text('OptionsDialog', 'Source'))
         self.label_dest.setText(interface.text('OptionsDialog', 'Destination'))
@@ -328,6 +343,11 @@ class OptionsDialog(QDialog, Ui_OptionsDialog):
         config.set_value('save', 'backup', self.cb_backup.isChecked())
         config.set_value('save', 'experemental', self.cb_experemental.isChecked())
         config.set_value('dictionaries', 'strong', self.cb_strong.isChecked())
+        config.set_value('dictionaries', 'database', self.cb_database.isChecked())
+
+    def fuzzy_change(self):
+        self.sb_fuzzy.setEnabled(self.cb_fuzzy.isChecked())
+        config.set_value('dictionaries', 'fuzzy', self.sb_fuzzy.value() if self.cb_fuzzy.isChecked() else 0)
 
     def build_click(self):
         exists = expansions.exists()
@@ -350,6 +370,7 @@ class OptionsDialog(QDialog, Ui_OptionsDialog):
         if self.__progress <= 0:
             self.__progress = 0
             progress_signals.finished.emit()
+            app_state.dictionaries_storage.reload()
 
     def close_click(self):
         self.close()
@@ -181,11 +181,11 @@ class TranslateDialog(QDialog, Ui_TranslateDialog):
         else:
             items = app_state.packages_storage.items()
             if self.rb_validated.isChecked():
-                items = [i for i in items if i.flag in (FLAG_UNVALIDATED, FLAG_PROGRESS, FLAG_REPLACED)]
+                items = [i for i in items if i.flag in (FLAG_UNVALIDATED, FLAG_PROGRESS, FLAG_REPLACED, FLAG_FUZZY)]
             elif self.rb_validated_partial.isChecked():
                 items = [i for i in items if i.flag == FLAG_UNVALIDATED]
             elif self.rb_partial.isChecked():
-                items = [i for i in items if i.flag in (FLAG_PROGRESS, FLAG_REPLACED)]
+                items = [i for i in items if i.flag in (FLAG_PROGRESS, FLAG_REPLACED, FLAG_FUZZY)]
 
         if not items:
             progress_signals.finished.emit()
@@ -2,7 +2,7 @@
 
 from PySide6.QtCore import QMetaObject, Qt
 from PySide6.QtWidgets import QWidget, QAbstractItemView, QCheckBox, QComboBox, QGroupBox, QHBoxLayout, QLabel, \
-    QLineEdit, QPushButton, QTableView, QVBoxLayout, QTabWidget, QHeaderView
+    QLineEdit, QPushButton, QTableView, QVBoxLayout, QTabWidget, QHeaderView, QSpinBox
 
 
 class Ui_OptionsDialog(object):
@@ -163,6 +163,29 @@ class Ui_OptionsDialog(object):
 
         vlayout.addWidget(self.gb_path)
 
+        self.gb_dictionaries = QGroupBox(self.tab_dictionaries)
+
+        layout_group = QVBoxLayout(self.gb_dictionaries)
+
+        self.cb_database = QCheckBox(self.gb_dictionaries)
+
+        layout_fuzzy = QHBoxLayout()
+
+        self.cb_fuzzy = QCheckBox(self.gb_dictionaries)
+
+        self.sb_fuzzy = QSpinBox(self.gb_dictionaries)
+        self.sb_fuzzy.setRange(50, 100)
+        self.sb_fuzzy.setSuffix('%')
+
+        layout_fuzzy.addWidget(self.cb_fuzzy)
+        layout_fuzzy.addWidget(self.sb_fuzzy)
+        layout_fuzzy.addStretch()
+
+        layout_group.addWidget(self.cb_database)
+        layout_group.addLayout(layout_fuzzy)
+
+        vlayout.addWidget(self.gb_dictionaries)
+
         self.tableview = QTableView(self.tab_dictionaries)
         self.tableview.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
         self.tableview.setAutoScroll(False)